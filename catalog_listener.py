@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+catalog_listener.py — Reference in-process catalog cache kept fresh by LISTEN/NOTIFY
+─────────────────────────────────────────────────────────────────────────────
+Every committed change to colleges gets a catalog version; the ids it touched
+are recorded in college_changes and the commit sends NOTIFY catalog_changed
+(seed_colleges.py, migration 22). CatalogCache shows how an API process can
+use that instead of TTLs or full flushes:
+  · /colleges/{id} entries stay cached until their id shows up in a change
+  · the college list is dropped whenever the version moves
+  · every response carries an ETag, so clients can send If-None-Match and
+    get a 304 without the API touching Postgres
+
+Prerequisites:
+  pip install psycopg2-binary python-dotenv
+  DATABASE_URL must be a direct or session-pooled connection: LISTEN does not
+  survive a transaction pooler.
+
+Run:
+  python catalog_listener.py               # follow changes, print evictions
+  python catalog_listener.py --warm 100    # cache 100 colleges first
+─────────────────────────────────────────────────────────────────────────────
+"""
+
+import argparse
+import json
+import os
+import select
+import threading
+import time
+
+import psycopg2
+
+import seed_colleges as seed
+
+COLLEGE_SQL = "SELECT row_to_json(c) FROM colleges c WHERE c.id = %s"
+LIST_SQL = """
+SELECT id, name, city, state, type, rating, nirf_rank
+FROM colleges ORDER BY nirf_rank NULLS LAST, name
+"""
+WARM_SQL = "SELECT id FROM colleges ORDER BY nirf_rank NULLS LAST, name LIMIT %s"
+POLL_SECONDS = 30.0  # also re-sync this often in case a notification was missed
+
+
+class CatalogCache:
+    """
+    Thread-safe cache of college rows keyed by id, plus the list. `reader` is
+    used for cache misses; sync() is driven by follow() on a LISTEN connection.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.version = 0
+        self.colleges = {}    # id -> (etag, row)
+        self.listing = None   # (etag, rows)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def etag(self):
+        return f'W/"catalog-{self.version}"'
+
+    def _load(self, sql, params=None):
+        with self.reader.cursor() as cur:
+            cur.execute(sql, params)
+            rows = cur.fetchall()
+        self.reader.commit()
+        return rows
+
+    def college(self, college_id):
+        """Return (etag, row) for one college, or None if it doesn't exist."""
+        with self._lock:
+            hit = self.colleges.get(college_id)
+            seen = self.version
+        if hit is not None:
+            self.hits += 1
+            return hit
+        self.misses += 1
+        rows = self._load(COLLEGE_SQL, (college_id,))
+        if not rows:
+            return None
+        entry = (f'"college-{college_id}-v{seen}"', rows[0][0])
+        # A change may have committed while we were reading; if sync() ran in
+        # the meantime, this row may be one it already evicted. Don't keep it.
+        with self._lock:
+            if self.version == seen:
+                self.colleges[college_id] = entry
+        return entry
+
+    def college_list(self):
+        """Return (etag, rows) for the whole list."""
+        with self._lock:
+            hit = self.listing
+            seen = self.version
+        if hit is not None:
+            self.hits += 1
+            return hit
+        self.misses += 1
+        entry = (f'W/"catalog-{seen}"', self._load(LIST_SQL))
+        with self._lock:
+            if self.version == seen:
+                self.listing = entry
+        return entry
+
+    def sync(self, conn):
+        """Catch up to the current version. Returns (version, evicted ids or None if flushed)."""
+        version, changes = seed.changes_since(conn, self.version)
+        conn.commit()
+        with self._lock:
+            if changes is None:
+                self.colleges.clear()
+                evicted = None
+            else:
+                evicted = [cid for cid in changes if self.colleges.pop(cid, None) is not None]
+            if version != self.version:
+                self.listing = None
+            self.version = version
+        return version, evicted
+
+    def follow(self, conn, on_sync=None, poll=POLL_SECONDS):
+        """LISTEN on `conn` and sync on every notification (blocks until the connection fails)."""
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {seed.CATALOG_CHANNEL}")
+        conn.autocommit = False
+        # Anything committed before LISTEN took effect is picked up here.
+        result = self.sync(conn)
+        if on_sync is not None:
+            on_sync(result, None)
+        while True:
+            if select.select([conn], [], [], poll) != ([], [], []):
+                conn.poll()
+            payloads = [json.loads(n.payload) for n in conn.notifies]
+            conn.notifies.clear()
+            result = self.sync(conn)
+            if on_sync is not None and (payloads or result[1]):
+                on_sync(result, payloads)
+
+
+# ─── Demo ──────────────────────────────────────────────────────────────────────
+def report(result, payloads):
+    version, evicted = result
+    if evicted is None:
+        print(f"🧹  v{version}: change history pruned — cache flushed")
+    elif payloads is None:
+        print(f"👂  Listening at catalog version {version}")
+    else:
+        changed = sum(p.get("changed", 0) for p in payloads)
+        print(f"🔔  v{version}: {changed:,} college changes notified, {len(evicted):,} cached entries evicted")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Follow catalog changes with an in-process cache.")
+    parser.add_argument("--warm", type=int, default=0, metavar="N", help="cache the top N colleges first")
+    parser.add_argument("--poll", type=float, default=POLL_SECONDS, metavar="SECONDS",
+                        help=f"re-sync at least this often (default {POLL_SECONDS:g})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    os.environ.pop("TRANSACTION_POOLER_URL", None)
+    seed.configure_connections(pooler_mode="session")
+
+    cache = CatalogCache(seed.get_connection())
+    if args.warm:
+        for (college_id,) in cache._load(WARM_SQL, (args.warm,)):
+            cache.college(college_id)
+        print(f"🔥  Cached {len(cache.colleges):,} colleges")
+
+    attempt = 0
+    while True:
+        try:
+            cache.follow(seed.get_connection(), report, args.poll)
+        except psycopg2.OperationalError as e:
+            # Missed notifications are harmless: the next sync() reads every
+            # change after the version we already applied.
+            delay = seed.backoff_delay(attempt)
+            attempt += 1
+            print(f"⚠️   Listener connection lost ({str(e).strip()}) — reconnecting in {delay:.1f}s")
+            time.sleep(delay)
+        except KeyboardInterrupt:
+            print(f"\n📊  {cache.hits:,} hits · {cache.misses:,} misses · {len(cache.colleges):,} cached")
+            return
+
+
+if __name__ == "__main__":
+    main()
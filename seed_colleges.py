@@ -4,23 +4,58 @@ seed_colleges.py — Insert top 100 Indian colleges into Zpluse University DB
 ─────────────────────────────────────────────────────────────────────────────
 Prerequisites:
   pip install psycopg2-binary python-dotenv
+  pip install "psycopg[binary]"        # only for --engine async
+  pip install brotli                   # optional: .br files for --export
+  pip install numpy                    # optional: needed for --similar; vectorizes validation
+                                       # (without it, validation checks values one by one)
 
 Before running:
   1. Run backend/sql/migrate_college_fields.sql in Supabase SQL Editor
   2. Ensure your .env has TRANSACTION_POOLER_URL or DATABASE_URL
 
 Run:
-  python seed_colleges.py
+  python seed_colleges.py                               # built-in COLLEGES list
+  python seed_colleges.py --source colleges.csv.gz      # stream a CSV/JSONL file
+  python seed_colleges.py --source colleges.jsonl --chunk-size 5000
+  python seed_colleges.py --source synthetic:100000     # generated benchmark rows
+  python seed_colleges.py --export catalog/ --export-only   # static CDN snapshot
+  python seed_colleges.py --source scraped.csv --dedupe report --dedupe-report merges.json
+  python seed_colleges.py --post-load-only --similar    # finish post-load steps off-peak
 ─────────────────────────────────────────────────────────────────────────────
 """
 
+import argparse
+import asyncio
+import bisect
+import cProfile
+import csv
+import difflib
+import gzip
+import hashlib
+import io
+import itertools
 import json
+import math
 import os
+import pstats
+import queue
+import random
+import re
 import sys
+import tempfile
+import threading
+import time
+import unicodedata
+import zlib
+from collections import defaultdict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from urllib.parse import urlparse, unquote
 
 try:
     import psycopg2
+    import psycopg2.extensions
+    import psycopg2.pool
     from psycopg2.extras import execute_values
 except ImportError:
     print("❌  Missing psycopg2. Run:  pip install psycopg2-binary")
@@ -32,6 +67,11 @@ try:
 except ImportError:
     pass  # fine — use system env vars
 
+try:
+    import numpy as np
+except ImportError:
+    np = None  # --similar needs it; validation falls back to plain Python
+
 
 # ─── Cover image pool (Unsplash static URLs, cycle through) ──────────────────
 COVERS = [
@@ -807,64 +847,1243 @@ COLLEGES = [
 ]
 
 
+# ─── Sources ───────────────────────────────────────────────────────────────────
+# A source is a zero-argument callable returning a fresh iterator of College
+# records (COLLEGES column order above). Files are read lazily, one record at a
+# time, so memory use does not grow with the size of the input.
+
+FIELDS = (
+    "name", "description", "city", "state", "type", "established_year",
+    "rating", "is_featured", "website", "logo_url", "cover_image_url",
+    "fee_structure", "affiliation", "courses", "nirf_rank",
+)
+
+# A tuple subclass with no per-instance dict: as small as the plain tuples it
+# replaces, and code that indexes records positionally keeps working.
+College = namedtuple("College", FIELDS)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def builtin_source():
+    return map(College._make, COLLEGES)
+
+
+def _open_text(path):
+    """Open a text file for reading, transparently decompressing *.gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _to_int(value):
+    return None if _blank(value) else int(value)
+
+
+def _to_float(value):
+    return None if _blank(value) else float(value)
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if _blank(value):
+        return False
+    return str(value).strip().lower() in ("1", "true", "t", "yes", "y")
+
+
+def _to_courses(value):
+    """Courses arrive as a list (JSONL), a JSON array string, or a ';'-separated string (CSV)."""
+    if _blank(value):
+        return []
+    if isinstance(value, list):
+        return value
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [c.strip() for c in value.split(";") if c.strip()]
+
+
+def _to_str(value):
+    return None if _blank(value) else str(value).strip()
+
+
+def _lenient(convert, value):
+    """Convert, or keep the raw value so validation can reject the row with a reason."""
+    try:
+        return convert(value)
+    except (ValueError, TypeError):
+        return value
+
+
+def record_to_tuple(rec):
+    """Coerce a dict keyed by FIELDS (from CSV or JSONL) into a College."""
+    return College(
+        _to_str(rec.get("name")),
+        _to_str(rec.get("description")),
+        _to_str(rec.get("city")),
+        _to_str(rec.get("state")),
+        _to_str(rec.get("type")),
+        _lenient(_to_int, rec.get("established_year")),
+        _lenient(_to_float, rec.get("rating")),
+        _to_bool(rec.get("is_featured")),
+        _to_str(rec.get("website")),
+        _to_str(rec.get("logo_url")),
+        _to_str(rec.get("cover_image_url")),
+        _to_str(rec.get("fee_structure")),
+        _to_str(rec.get("affiliation")),
+        _lenient(_to_courses, rec.get("courses")),
+        _lenient(_to_int, rec.get("nirf_rank")),
+    )
+
+
+def iter_csv(path):
+    with _open_text(path) as fh:
+        for rec in csv.DictReader(fh):
+            yield record_to_tuple(rec)
+
+
+def iter_jsonl(path):
+    with _open_text(path) as fh:
+        for line in fh:
+            if line.strip():
+                yield record_to_tuple(json.loads(line))
+
+
+# ─── Synthetic source ("synthetic:N[:SEED]") ────────────────────────────────────
+# Deterministic, COLLEGES-shaped rows for benchmarks. Vocabulary (cities, fees,
+# affiliations, courses, description sentences) is drawn from COLLEGES so the
+# value distributions look like the real catalog; description length, course
+# list length and nirf_rank nullability vary per row.
+SYNTHETIC_PREFIXES = (
+    "Institute of", "College of", "University of", "School of", "Academy of",
+    "National Institute of", "Global Institute of", "Centre for",
+)
+SYNTHETIC_FIELDS = (
+    "Technology", "Engineering", "Management", "Science", "Medical Sciences",
+    "Law", "Design", "Pharmacy", "Arts and Commerce", "Architecture",
+    "Agriculture", "Information Technology", "Hotel Management", "Education",
+)
+
+
+def _synthetic_pools():
+    sentences = sorted({
+        s.strip() + "."
+        for c in COLLEGES for s in c[1].split(". ") if len(s.strip()) > 20
+    })
+    return {
+        "places": sorted({(c[2], c[3]) for c in COLLEGES}),
+        "fees": sorted({c[11] for c in COLLEGES if c[11]}),
+        "affiliations": sorted({c[12] for c in COLLEGES if c[12]}),
+        "courses": sorted({course for c in COLLEGES for course in c[13]}),
+        "sentences": [s.rstrip(".") + "." for s in sentences],
+    }
+
+
+def iter_synthetic(n, seed=0):
+    rng = random.Random(seed)
+    pools = _synthetic_pools()
+    for i in range(n):
+        city, state = rng.choice(pools["places"])
+        field = rng.choice(SYNTHETIC_FIELDS)
+        name = f"{rng.choice(SYNTHETIC_PREFIXES)} {field} {city} #{i + 1}"
+        slug = f"c{i + 1}{field.split()[0].lower()}"
+        yield College(
+            name,
+            " ".join(rng.sample(pools["sentences"], rng.randint(1, 12))),
+            city, state,
+            "Public" if rng.random() < 0.4 else "Private",
+            rng.randint(1850, 2020),
+            round(rng.uniform(3.0, 5.0), 2),
+            rng.random() < 0.05,
+            f"https://www.{slug}.ac.in", logo(f"{slug}.ac.in"), cover(i),
+            rng.choice(pools["fees"]),
+            rng.choice(pools["affiliations"]),
+            rng.sample(pools["courses"], rng.randint(1, 12)),
+            rng.randint(1, 300) if rng.random() < 0.35 else None,
+        )
+
+
+def make_source(spec=None):
+    """
+    Resolve a --source argument to a source callable.
+    None or "builtin" → the COLLEGES list; "synthetic:N[:SEED]" → N generated rows;
+    *.csv / *.jsonl / *.ndjson (optionally .gz) → that file.
+    """
+    if spec in (None, "builtin"):
+        return builtin_source
+
+    if spec.startswith("synthetic:"):
+        parts = spec.split(":")
+        if len(parts) not in (2, 3) or not all(p.isdigit() for p in parts[1:]):
+            raise ValueError(f"Bad synthetic source: {spec} (expected synthetic:N or synthetic:N:SEED)")
+        n, seed = int(parts[1]), int(parts[2]) if len(parts) == 3 else 0
+        return lambda: iter_synthetic(n, seed)
+
+    base = spec[:-3] if spec.endswith(".gz") else spec
+    if base.endswith(".csv"):
+        reader = iter_csv
+    elif base.endswith((".jsonl", ".ndjson")):
+        reader = iter_jsonl
+    else:
+        raise ValueError(f"Unsupported source format: {spec} (expected .csv or .jsonl, optionally .gz)")
+
+    if not os.path.isfile(spec):
+        raise FileNotFoundError(spec)
+    return lambda: reader(spec)
+
+
+def content_hash(values):
+    """Stable 128-bit hex digest of a row's content, used to skip unchanged rows."""
+    payload = json.dumps(values, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def to_db_row(c):
+    """
+    Map a College to INSERT_SQL column order (courses as JSON text for JSONB),
+    with the row's content hash appended as the last column.
+    """
+    row = (
+        c.name, c.description, c.city, c.state, "India", c.type, c.established_year,
+        c.rating, c.is_featured, c.website, c.logo_url, c.cover_image_url,
+        c.fee_structure, c.affiliation, json.dumps(c.courses) if c.courses else '[]', c.nirf_rank
+    )
+    return row + (content_hash(row),)
+
+
+def chunked(iterable, size):
+    """Yield lists of at most `size` items without materialising the whole iterable."""
+    it = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ─── Validation (--rejects) ────────────────────────────────────────────────────
+# Records are checked in batches before they become DB rows, so one bad value
+# costs one rejected row instead of an aborted transaction. With numpy, each
+# rule is one pass over a whole column producing a mask (numeric ranges are
+# array comparisons, string rules map a builtin over the column); only the
+# flagged rows go through the per-value check, which also writes the reason.
+# Without numpy (or for small batches) every value takes the per-value path;
+# both give the same result.
+# Rules are (field, check, arg); every bounded column the loader writes has a
+# length rule matching its type (course names: course_dictionary.name).
+COLLEGE_TYPES = ("Public", "Private", "Deemed", "Autonomous")
+VALIDATION_RULES = (
+    ("name", "required", None),
+    ("name", "text", 255),
+    ("city", "text", 100),
+    ("state", "text", 100),
+    ("type", "text", 50),
+    ("type", "enum", COLLEGE_TYPES),
+    ("fee_structure", "text", 200),
+    ("affiliation", "text", 300),
+    ("established_year", "range", (1700, time.gmtime().tm_year)),
+    ("rating", "range", (0, 5)),
+    ("nirf_rank", "range", (1, 10_000)),
+    ("website", "url", 255),
+    ("logo_url", "url", None),
+    ("cover_image_url", "url", None),
+    ("courses", "courses", (200, 120)),   # (max courses, max characters per course)
+)
+FIELD_INDEX = {f: i for i, f in enumerate(FIELDS)}
+VALIDATE_BATCH = 10_000
+VALIDATE_NUMPY_MIN = 500   # below this, building the columns costs more than it saves
+DEFAULT_REJECTS = "seed_rejects.jsonl"
+
+
+def _is_url(value, max_len):
+    return (
+        isinstance(value, str)
+        and (value.startswith("http://") and len(value) > 7 or value.startswith("https://") and len(value) > 8)
+        and " " not in value
+        and (max_len is None or len(value) <= max_len)
+    )
+
+
+def _is_number_or_none(value):
+    return value is None or isinstance(value, (int, float))
+
+
+def value_problem(check, arg, value):
+    """Why `value` fails a rule, or None if it passes."""
+    if check == "required":
+        return "missing" if _blank(value) else None
+    if value is None:
+        return None
+    if check == "text":
+        if not isinstance(value, str):
+            return f"{value!r} is not text"
+        if len(value) > arg:
+            return f"{len(value)} characters (max {arg})"
+    if check == "enum" and value not in arg:
+        return f"{value!r} is not one of {', '.join(arg)}"
+    if check == "range":
+        if not isinstance(value, (int, float)):
+            return f"{value!r} is not a number"
+        lo, hi = arg
+        if not lo <= value <= hi:
+            return f"{value} is outside {lo}–{hi}"
+    if check == "url" and not _is_url(value, arg):
+        return f"{value!r} is not an http(s) URL" + (f" of at most {arg} characters" if arg else "")
+    if check == "courses":
+        if not isinstance(value, list) or not all(isinstance(c, str) and c.strip() for c in value):
+            return "not a list of course names"
+        max_courses, max_len = arg
+        if len(value) > max_courses:
+            return f"{len(value)} courses (max {max_courses})"
+        longest = max(map(len, value), default=0)
+        if longest > max_len:
+            return f"a course name has {longest} characters (max {max_len})"
+    return None
+
+
+def _numpy_flags(check, arg, values):
+    """Boolean mask of the rows that fail a rule; agrees with value_problem() row for row."""
+    n = len(values)
+
+    def column(fn, *iterables):
+        return np.fromiter(map(fn, *iterables), dtype=np.int64, count=n)
+
+    def scalar():
+        return np.array([value_problem(check, arg, v) is not None for v in values], dtype=bool)
+
+    if check == "range":
+        # np.array(..., float64) would happily parse raw strings that _lenient
+        # kept ("12.0"); only an all-numeric column takes the array path.
+        if not all(map(_is_number_or_none, values)):
+            return scalar()
+        nums = np.array(values, dtype=np.float64)   # None → nan
+        lo, hi = arg
+        null = np.equal(np.array(values, dtype=object), None)
+        return ~null & ~((nums >= lo) & (nums <= hi))
+    if check == "courses":
+        if set(map(type, values)) != {list}:
+            return scalar()
+        flat = list(itertools.chain.from_iterable(values))
+        if set(map(type, flat)) - {str}:
+            return scalar()
+        max_courses, max_len = arg
+        sizes = column(len, values)
+        stripped = np.fromiter(map(len, map(str.strip, flat)), dtype=np.int64, count=len(flat))
+        lengths = np.fromiter(map(len, flat), dtype=np.int64, count=len(flat))
+        flags = sizes > max_courses
+        flags[np.repeat(np.arange(n), sizes)[(stripped == 0) | (lengths > max_len)]] = True
+        return flags
+
+    col = np.empty(n, dtype=object)
+    col[:] = values
+    null = np.equal(col, None)
+    text = np.where(null, "", col)
+    if set(map(type, text)) - {str}:
+        return scalar()
+    lengths = column(len, text)
+    if check == "required":
+        return null | (column(len, map(str.strip, text)) == 0)
+    if check == "text":
+        return ~null & (lengths > arg)
+    if check == "enum":
+        return ~null & (column(frozenset(arg).__contains__, text) == 0)
+    if check == "url":
+        http = column(str.startswith, text, itertools.repeat("http://")).astype(bool)
+        https = column(str.startswith, text, itertools.repeat("https://")).astype(bool)
+        spaced = column(str.__contains__, text, itertools.repeat(" ")).astype(bool)
+        ok = ((http & (lengths > 7)) | (https & (lengths > 8))) & ~spaced
+        if arg is not None:
+            ok &= lengths <= arg
+        return ~null & ~ok
+    raise ValueError(f"unknown validation check {check!r}")
+
+
+def _duplicate_names(names):
+    """Indexes of names that a later row in the batch overrides (the upsert keeps the last)."""
+    if np is not None and len(names) >= VALIDATE_NUMPY_MIN:
+        col = np.array(["" if n is None else n for n in names], dtype=object)[::-1]
+        _, last = np.unique(col, return_index=True)
+        keep = np.zeros(len(names), dtype=bool)
+        keep[len(names) - 1 - last] = True
+        return [int(i) for i in np.flatnonzero(~keep) if names[i] is not None]
+    last = {n: i for i, n in enumerate(names)}
+    return [i for i, n in enumerate(names) if n is not None and last[n] != i]
+
+
+def validate_batch(records):
+    """Return {index in batch: [reasons]} for the records that must not be loaded."""
+    problems = defaultdict(list)
+    vectorized = np is not None and len(records) >= VALIDATE_NUMPY_MIN
+    for field, check, arg in VALIDATION_RULES:
+        values = [r[FIELD_INDEX[field]] for r in records]
+        if vectorized:
+            flagged = np.flatnonzero(_numpy_flags(check, arg, values))
+        else:
+            flagged = range(len(values))
+        for i in flagged:
+            reason = value_problem(check, arg, values[i])
+            if reason is not None:
+                problems[int(i)].append(f"{field}: {reason}")
+    names = [None if i in problems else r.name for i, r in enumerate(records)]
+    for i in _duplicate_names(names):
+        problems[i].append("name: repeated later in the batch (the later row is loaded)")
+    return dict(problems)
+
+
+class Validator:
+    """
+    Pass valid records through, batch by batch, and append each rejected one
+    to a JSONL reject file with its reasons. `count` mirrors a CountingIterator
+    over `feed`: the source position just past the last record handed on, so
+    --commit-every checkpoints never skip records still waiting in a batch.
+    """
+
+    def __init__(self, records, reject_path=DEFAULT_REJECTS, feed=None, base=0, append=False,
+                 batch_size=VALIDATE_BATCH):
+        self.records = iter(records)
+        self.reject_path = reject_path
+        self.feed = feed
+        self.base = base
+        self.mode = "a" if append else "w"
+        self.batch_size = batch_size
+        self.count = 0
+        self.rejected = 0
+        self.reasons = defaultdict(int)
+        self._fh = None
+
+    def __iter__(self):
+        if self.mode == "w" and os.path.exists(self.reject_path):
+            os.remove(self.reject_path)  # don't leave the previous run's rejects behind
+        pulled = 0
+        while True:
+            batch, positions = [], []
+            for record in itertools.islice(self.records, self.batch_size):
+                pulled += 1
+                batch.append(record)
+                positions.append(self.feed.count if self.feed is not None else pulled)
+            if not batch:
+                break
+            with METRICS.phase("validate"):
+                problems = validate_batch(batch)
+            for i, reasons in sorted(problems.items()):
+                self._reject(positions[i], batch[i], reasons)
+            for i, record in enumerate(batch):
+                if i not in problems:
+                    self.count = positions[i]
+                    yield record
+        self.close()
+
+    def _reject(self, position, record, reasons):
+        if self._fh is None:
+            self._fh = open(self.reject_path, self.mode, encoding="utf-8")
+        self._fh.write(json.dumps({
+            "source_record": self.base + position,
+            "reasons": reasons,
+            "record": record._asdict(),
+        }, ensure_ascii=False, default=str) + "\n")
+        self.rejected += 1
+        for reason in reasons:
+            self.reasons[reason.split(":", 1)[0]] += 1
+        METRICS.add("rows_rejected")
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def print(self):
+        if not self.rejected:
+            return
+        by_field = " · ".join(f"{f} {n:,}" for f, n in sorted(self.reasons.items(), key=lambda kv: -kv[1]))
+        print(f"    🚫  {self.rejected:,} invalid record(s) skipped ({by_field}) — see {self.reject_path}")
+
+
+# ─── Instrumentation (--metrics / --profile) ───────────────────────────────────
+# Phase durations are summed across threads, so with --workers N the "send"
+# phase is total shard time, not wall time. Server counters come from
+# pg_stat_user_tables, which the server updates asynchronously, so tuple
+# counts can trail the run by up to a second; the WAL delta is exact.
+SERVER_STATS_SQL = """
+SELECT
+  COALESCE((SELECT n_tup_ins     FROM pg_stat_user_tables WHERE relname = 'colleges'), 0),
+  COALESCE((SELECT n_tup_upd     FROM pg_stat_user_tables WHERE relname = 'colleges'), 0),
+  COALESCE((SELECT n_tup_hot_upd FROM pg_stat_user_tables WHERE relname = 'colleges'), 0),
+  COALESCE((SELECT n_tup_del     FROM pg_stat_user_tables WHERE relname = 'colleges'), 0),
+  pg_current_wal_lsn()
+"""
+SERVER_STAT_NAMES = ("tuples_inserted", "tuples_updated", "tuples_hot_updated", "tuples_deleted")
+WAL_DIFF_SQL = "SELECT pg_wal_lsn_diff(%s, %s)::bigint"
+
+
+class Metrics:
+    def __init__(self):
+        self.phases = defaultdict(float)
+        self.counters = defaultdict(int)
+        self.server = {}
+        self._server_before = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] += elapsed
+
+    def add(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _read_server(self, conn):
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_stat_clear_snapshot()")
+                cur.execute(SERVER_STATS_SQL)
+                return cur.fetchone()
+        except psycopg2.Error as e:
+            conn.rollback()
+            print(f"    ⚠️   Server stats unavailable: {str(e).strip()}")
+            return None
+
+    def capture_server_before(self, conn):
+        self._server_before = self._read_server(conn)
+
+    def capture_server_after(self, conn):
+        if self._server_before is None:
+            return
+        after = self._read_server(conn)
+        if after is None:
+            return
+        for name, b, a in zip(SERVER_STAT_NAMES, self._server_before, after):
+            self.server[name] = a - b
+        with conn.cursor() as cur:
+            cur.execute(WAL_DIFF_SQL, (after[-1], self._server_before[-1]))
+            self.server["wal_bytes"] = int(cur.fetchone()[0])
+        conn.commit()
+
+    def records(self):
+        out = [{"type": "phase", "phase": k, "seconds": round(v, 6)} for k, v in self.phases.items()]
+        out += [{"type": "counter", "name": k, "value": v} for k, v in self.counters.items()]
+        out += [{"type": "server", "name": k, "value": v} for k, v in self.server.items()]
+        return out
+
+    def to_jsonl(self):
+        return "".join(json.dumps(r) + "\n" for r in self.records())
+
+    def to_openmetrics(self):
+        lines = [
+            "# TYPE seed_phase_seconds gauge",
+            "# UNIT seed_phase_seconds seconds",
+            "# HELP seed_phase_seconds Time spent per seed pipeline phase.",
+        ]
+        lines += [f'seed_phase_seconds{{phase="{k}"}} {v:.6f}' for k, v in self.phases.items()]
+        for k, v in self.counters.items():
+            lines += [f"# TYPE seed_{k} counter", f"seed_{k}_total {v}"]
+        for k, v in self.server.items():
+            lines += [f"# TYPE seed_server_{k} gauge", f"seed_server_{k} {v}"]
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
 # ─── DB connection ─────────────────────────────────────────────────────────────
-def get_connection():
+# Every connection gets TCP keepalives (so a silently dropped pooler link fails
+# fast instead of hanging), connect retries with jittered backoff, and optional
+# statement_timeout / lock_timeout.
+#
+# Pooler modes:
+#   session      — direct or session-pooled connection; timeouts are sent once
+#                  as startup options.
+#   transaction  — PgBouncer/Supavisor transaction pooling (Supabase port 6543).
+#                  Consecutive transactions may land on different backends, so
+#                  nothing may rely on session state: timeouts are re-applied
+#                  with set_config(..., is_local => true) at the start of every
+#                  transaction, temp tables are ON COMMIT DROP, server-side
+#                  cursors live inside one transaction, and no server-side
+#                  prepared statements are used (psycopg2 binds client-side).
+#   auto         — transaction when TRANSACTION_POOLER_URL is used or the port
+#                  is 6543, session otherwise.
+TRANSACTION_POOLER_PORT = 6543
+CONNECT_TIMEOUT = 15
+CONNECT_RETRIES = 4
+HEALTHCHECK_IDLE = 30.0   # seconds idle before a pooled connection is pinged
+
+KEEPALIVE_PARAMS = {
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+BACKOFF_BASE = 0.5   # seconds
+BACKOFF_MAX = 30.0
+
+DB_SETTINGS = {
+    "pooler_mode": os.getenv("SEED_POOLER_MODE", "auto"),
+    "statement_timeout": os.getenv("SEED_STATEMENT_TIMEOUT"),   # e.g. "5min", "30000"
+    "lock_timeout": os.getenv("SEED_LOCK_TIMEOUT"),             # e.g. "10s"
+    "sslmode": os.getenv("SEED_SSLMODE", "require"),          # "disable" for a local Postgres
+    "connect_retries": CONNECT_RETRIES,
+    "pool_size": 4,
+}
+
+
+def configure_connections(**settings):
+    """Override DB_SETTINGS (from CLI flags) before the first connection is opened."""
+    unknown = set(settings) - set(DB_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown connection settings: {', '.join(sorted(unknown))}")
+    DB_SETTINGS.update({k: v for k, v in settings.items() if v is not None})
+
+
+def backoff_delay(attempt):
+    """Exponential backoff with jitter: 0.5s, 1s, 2s, … capped at BACKOFF_MAX."""
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+
+def _resolve_url():
+    for var in ("TRANSACTION_POOLER_URL", "DATABASE_URL"):
+        value = os.getenv(var)
+        if value:
+            return value.strip(), var  # Remove trailing spaces/newlines from .env
+    return None, None
+
+
+def pooler_mode(env_var=None, port=None):
+    mode = DB_SETTINGS["pooler_mode"]
+    if mode != "auto":
+        return mode
+    if env_var is None:
+        url, env_var = _resolve_url()
+        port = urlparse(url).port if url else None
+    if env_var == "TRANSACTION_POOLER_URL" or port == TRANSACTION_POOLER_PORT:
+        return "transaction"
+    return "session"
+
+
+def session_settings():
+    return {
+        k: str(DB_SETTINGS[k])
+        for k in ("statement_timeout", "lock_timeout")
+        if DB_SETTINGS[k] not in (None, "")
+    }
+
+
+class PoolerSafeCursor(psycopg2.extensions.cursor):
+    """Cursor that makes sure the connection's per-transaction settings are in place."""
+
+    def execute(self, query, vars=None):
+        self.connection.apply_local_settings()
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self.connection.apply_local_settings()
+        return super().executemany(query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        self.connection.apply_local_settings()
+        return super().copy_expert(sql, file, size)
+
+
+class PoolerSafeConnection(psycopg2.extensions.connection):
+    """
+    Connection for transaction-pooler mode: session settings are applied with
+    set_config(..., true) at the start of each transaction instead of once per
+    session, because the pooler may hand the next transaction to another backend.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cursor_factory = PoolerSafeCursor
+        self.local_settings = {}
+
+    def apply_local_settings(self):
+        if self.autocommit or not self.local_settings:
+            return
+        if self.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            return  # already inside a transaction that has them
+        names = list(self.local_settings)
+        cur = psycopg2.extensions.cursor(self)
+        cur.execute(
+            "SELECT " + ", ".join("set_config(%s, %s, true)" for _ in names),
+            [v for name in names for v in (name, self.local_settings[name])],
+        )
+        cur.close()
+
+
+def connection_params():
     """
     Try TRANSACTION_POOLER_URL first (Render-compatible, IPv4).
     Fall back to DATABASE_URL (works locally with direct Supabase connection).
     Strips whitespace and handles URL-encoded passwords.
+    Returns (libpq keyword params, pooler mode, session settings).
     """
-    raw_url = (
-        os.getenv("TRANSACTION_POOLER_URL") or
-        os.getenv("DATABASE_URL")
-    )
+    url, env_var = _resolve_url()
 
-    if not raw_url:
+    if not url:
         print("❌  No DB URL found.")
         print("    Set TRANSACTION_POOLER_URL or DATABASE_URL in backend/.env")
         sys.exit(1)
 
-    url = raw_url.strip()  # Remove trailing spaces/newlines from .env
-
     # Parse host/port for display only
     parsed = urlparse(url)
-    print(f"🔌  Connecting to: {parsed.hostname}:{parsed.port}")
+    mode = pooler_mode(env_var, parsed.port)
+    print(f"🔌  Connecting to: {parsed.hostname}:{parsed.port} ({mode} pooling)")
 
     # Build clean DSN by explicitly decoding credentials
     # This avoids psycopg2 mishandling special chars in passwords
-    password = unquote(parsed.password or "")
-    username = unquote(parsed.username or "")
-    dbname = (parsed.path or "/postgres").lstrip("/").strip()
-    host = parsed.hostname
-    port = parsed.port or 5432
-
-    return psycopg2.connect(
-        host=host,
-        port=port,
-        dbname=dbname,
-        user=username,
-        password=password,
-        sslmode="require",
-        connect_timeout=15,
+    params = dict(
+        host=parsed.hostname,
+        port=parsed.port or 5432,
+        dbname=(parsed.path or "/postgres").lstrip("/").strip(),
+        user=unquote(parsed.username or ""),
+        password=unquote(parsed.password or ""),
+        sslmode=DB_SETTINGS["sslmode"],
+        connect_timeout=CONNECT_TIMEOUT,
+        application_name="zpluse-seed",
+        **KEEPALIVE_PARAMS,
     )
+    settings = session_settings()
+    if mode == "session" and settings:
+        params["options"] = " ".join(f"-c {k}={v}" for k, v in settings.items())
+    return params, mode, settings
 
 
-# ─── Schema migration (adds missing cols if not exist) ─────────────────────────
-MIGRATION_SQL = """
+def get_connection():
+    """Open a psycopg2 connection, retrying with jittered backoff when the server is unreachable."""
+    params, mode, settings = connection_params()
+    if mode == "transaction":
+        params["connection_factory"] = PoolerSafeConnection
+
+    retries = DB_SETTINGS["connect_retries"]
+    for attempt in range(retries + 1):
+        try:
+            conn = psycopg2.connect(**params)
+            break
+        except psycopg2.OperationalError as e:
+            if attempt == retries:
+                raise
+            METRICS.add("connect_retries")
+            delay = backoff_delay(attempt)
+            print(f"    ⚠️   Connect failed ({str(e).strip()}) — retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    if mode == "transaction":
+        conn.local_settings = settings
+    return conn
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool over get_connection(). Idle connections are
+    pinged before reuse once they have sat for HEALTHCHECK_IDLE seconds, and
+    anything returned mid-transaction is rolled back first.
+    """
+
+    def __init__(self, maxconn):
+        self.maxconn = maxconn
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < HEALTHCHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise psycopg2.pool.PoolError(f"no connection available within {timeout}s")
+        try:
+            while True:
+                with self._lock:
+                    item = self._idle.pop() if self._idle else None
+                if item is None:
+                    conn = get_connection()
+                    conn.autocommit = False
+                    return conn
+                conn, idle_since = item
+                if self._healthy(conn, idle_since):
+                    return conn
+                _close_quietly(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, close=False):
+        try:
+            if close or conn.closed:
+                _close_quietly(conn)
+                return
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.autocommit = False
+            except psycopg2.Error:
+                _close_quietly(conn)
+                return
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+
+def _close_quietly(conn):
+    try:
+        conn.close()
+    except psycopg2.Error:
+        pass
+
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool():
+    """Process-wide pool sized by DB_SETTINGS["pool_size"], created on first use."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ConnectionPool(DB_SETTINGS["pool_size"])
+        return _POOL
+
+
+# ─── Schema migrations ─────────────────────────────────────────────────────────
+# Versioned steps recorded in schema_migrations with a checksum of their SQL.
+# Applied versions are skipped by reading the ledger only, so a routine seed
+# run takes no lock on colleges at all. Each transactional step commits on its
+# own, before any data is sent. Steps with `concurrent_index` are index builds
+# run with CREATE INDEX CONCURRENTLY in autocommit mode; an INVALID index left
+# behind by an interrupted build is dropped and rebuilt. Never edit an applied
+# step — add a new version instead (a changed checksum aborts the run).
+Migration = namedtuple("Migration", "version name sql concurrent_index", defaults=(None,))
+
+MIGRATIONS = (
+    Migration(1, "college_catalog_columns", """
 ALTER TABLE colleges ADD COLUMN IF NOT EXISTS fee_structure VARCHAR(200);
 ALTER TABLE colleges ADD COLUMN IF NOT EXISTS affiliation   VARCHAR(300);
 ALTER TABLE colleges ADD COLUMN IF NOT EXISTS courses       JSONB DEFAULT '[]';
 ALTER TABLE colleges ADD COLUMN IF NOT EXISTS nirf_rank     INT;
-CREATE UNIQUE INDEX IF NOT EXISTS idx_colleges_name_unique ON colleges (name);
+"""),
+    Migration(2, "idx_colleges_name_unique", """
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_name_unique ON colleges (name);
+""", concurrent_index="idx_colleges_name_unique"),
+    Migration(3, "college_content_hash", """
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS content_hash CHAR(32);
+"""),
+    Migration(4, "seed_progress", """
+CREATE TABLE IF NOT EXISTS seed_progress (
+  job_id      TEXT PRIMARY KEY,
+  rows_done   BIGINT NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""),
+    # Search support. The generated column is maintained by Postgres on every
+    # insert/update, so the seeder never writes it; adding it rewrites the
+    # table once. 'simple' config: names and places must not be stemmed.
+    Migration(5, "pg_trgm", """
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+"""),
+    Migration(6, "college_search_tsv", """
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS search_tsv tsvector GENERATED ALWAYS AS (
+  setweight(to_tsvector('simple'::regconfig, coalesce(name, '')), 'A') ||
+  setweight(to_tsvector('simple'::regconfig, coalesce(city, '') || ' ' || coalesce(state, '')), 'B') ||
+  setweight(to_tsvector('simple'::regconfig, coalesce(affiliation, '')), 'C') ||
+  setweight(to_tsvector('simple'::regconfig, coalesce(description, '')), 'D')
+) STORED;
+"""),
+    Migration(7, "idx_colleges_search_tsv", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_search_tsv ON colleges USING GIN (search_tsv);
+""", concurrent_index="idx_colleges_search_tsv"),
+    Migration(8, "idx_colleges_name_trgm", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_name_trgm ON colleges USING GIN (name gin_trgm_ops);
+""", concurrent_index="idx_colleges_name_trgm"),
+    Migration(9, "idx_colleges_city_trgm", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_city_trgm ON colleges USING GIN (city gin_trgm_ops);
+""", concurrent_index="idx_colleges_city_trgm"),
+    Migration(10, "idx_colleges_courses_gin", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_courses_gin ON colleges USING GIN (courses jsonb_path_ops);
+""", concurrent_index="idx_colleges_courses_gin"),
+    # Normalized courses; colleges.courses stays as the display/compat copy.
+    Migration(11, "course_dictionary", """
+CREATE TABLE IF NOT EXISTS course_dictionary (
+  id     SERIAL PRIMARY KEY,
+  slug   VARCHAR(120) NOT NULL UNIQUE,
+  name   VARCHAR(120) NOT NULL,
+  level  VARCHAR(20)
+);
+CREATE TABLE IF NOT EXISTS college_courses (
+  college_id  INT NOT NULL REFERENCES colleges(id) ON DELETE CASCADE,
+  course_id   INT NOT NULL REFERENCES course_dictionary(id),
+  PRIMARY KEY (college_id, course_id)
+);
+CREATE INDEX IF NOT EXISTS idx_college_courses_course ON college_courses (course_id, college_id);
+"""),
+    Migration(12, "idx_colleges_state", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_state ON colleges (state);
+""", concurrent_index="idx_colleges_state"),
+    # Dictionary-encoded affiliation + parsed fees. The text columns stay
+    # (search_tsv and the API read them); college_encoded_text rebuilds both
+    # strings exactly from the encoded form. The ids are INT: the dictionaries
+    # grow with every distinct free-text value, past what SMALLINT holds.
+    Migration(13, "college_encoded_attributes", """
+CREATE TABLE IF NOT EXISTS accreditation_tokens (
+  id     SERIAL PRIMARY KEY,
+  token  VARCHAR(300) NOT NULL UNIQUE,
+  kind   VARCHAR(20) NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fee_schedules (
+  id    SERIAL PRIMARY KEY,
+  text  VARCHAR(200) NOT NULL UNIQUE
+);
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS accreditation_ids INT[];
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS naac_grade        VARCHAR(3);
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS fee_schedule_id   INT REFERENCES fee_schedules(id);
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS fee_min_inr       INT;
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS fee_max_inr       INT;
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS fee_period        VARCHAR(10);
+CREATE OR REPLACE VIEW college_encoded_text AS
+SELECT c.id,
+       (SELECT string_agg(t.token, ' | ' ORDER BY u.ord)
+        FROM unnest(c.accreditation_ids) WITH ORDINALITY AS u(id, ord)
+        JOIN accreditation_tokens t ON t.id = u.id) AS affiliation,
+       f.text AS fee_structure
+FROM colleges c
+LEFT JOIN fee_schedules f ON f.id = c.fee_schedule_id;
+"""),
+    Migration(14, "idx_colleges_fee_range", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_fee_range ON colleges (fee_min_inr, fee_max_inr);
+""", concurrent_index="idx_colleges_fee_range"),
+    Migration(15, "idx_colleges_accreditation_gin", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_accreditation_gin ON colleges USING GIN (accreditation_ids);
+""", concurrent_index="idx_colleges_accreditation_gin"),
+    # Facet counts for the catalog filters, refreshed after every seed. The
+    # unique index is what REFRESH ... CONCURRENTLY needs.
+    Migration(16, "college_facets", """
+CREATE TABLE IF NOT EXISTS catalog_versions (
+  version      BIGSERIAL PRIMARY KEY,
+  rows_loaded  BIGINT NOT NULL,
+  created_at   TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+CREATE MATERIALIZED VIEW IF NOT EXISTS college_facets AS
+SELECT 'state'::text AS facet, state AS value, count(*) AS colleges
+FROM colleges WHERE state IS NOT NULL GROUP BY state
+UNION ALL
+SELECT 'type', type, count(*)
+FROM colleges WHERE type IS NOT NULL GROUP BY type
+UNION ALL
+SELECT 'featured', coalesce(is_featured, false)::text, count(*)
+FROM colleges GROUP BY coalesce(is_featured, false)
+UNION ALL
+SELECT 'course', d.name, count(DISTINCT cc.college_id)
+FROM college_courses cc JOIN course_dictionary d ON d.id = cc.course_id GROUP BY d.name
+UNION ALL
+SELECT 'accreditation', t.token, count(DISTINCT c.id)
+FROM colleges c CROSS JOIN LATERAL unnest(c.accreditation_ids) AS a(id)
+JOIN accreditation_tokens t ON t.id = a.id GROUP BY t.token
+UNION ALL
+SELECT 'naac_grade', naac_grade, count(*)
+FROM colleges WHERE naac_grade IS NOT NULL GROUP BY naac_grade;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_college_facets_key ON college_facets (facet, value);
+"""),
+    Migration(17, "college_similar", """
+CREATE TABLE IF NOT EXISTS college_similar (
+  college_id  INT NOT NULL REFERENCES colleges(id) ON DELETE CASCADE,
+  rank        SMALLINT NOT NULL,
+  similar_id  INT NOT NULL REFERENCES colleges(id) ON DELETE CASCADE,
+  score       REAL NOT NULL,
+  PRIMARY KEY (college_id, rank)
+);
+"""),
+    # Offline geocoding. COLLATE "C" lets the plain btree serve geohash
+    # prefix matches (LIKE 'tsq4%').
+    Migration(18, "college_geo", """
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS latitude      DOUBLE PRECISION;
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS longitude     DOUBLE PRECISION;
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS geohash       VARCHAR(12) COLLATE "C";
+ALTER TABLE colleges ADD COLUMN IF NOT EXISTS geo_precision VARCHAR(5);
+"""),
+    Migration(19, "idx_colleges_geohash", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_geohash ON colleges (geohash);
+""", concurrent_index="idx_colleges_geohash"),
+    Migration(20, "seed_leases", """
+CREATE TABLE IF NOT EXISTS seed_leases (
+  name        TEXT PRIMARY KEY,
+  holder      TEXT NOT NULL,
+  expires_at  TIMESTAMPTZ NOT NULL
+);
+"""),
+    # Catalog listings are ORDER BY nirf_rank NULLS LAST, name LIMIT n: the
+    # index matches that order exactly (unranked colleges included), so the
+    # first page is an index scan that stops after n rows. --maintain prewarms it.
+    Migration(21, "idx_colleges_nirf_rank", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_nirf_rank ON colleges (nirf_rank NULLS LAST, name);
+""", concurrent_index="idx_colleges_nirf_rank"),
+    # Change log for API caches. Statement triggers record the ids touched by
+    # each transaction; a deferred trigger stamps the transaction with the next
+    # catalog version at commit (serialized, so versions follow commit order)
+    # and NOTIFYs catalog_changed with it. Transactions that SET LOCAL
+    # seed.derived = 'on' (the derived-table pass) are not recorded.
+    Migration(22, "college_changes", """
+ALTER TABLE catalog_versions ALTER COLUMN rows_loaded DROP NOT NULL;
+ALTER TABLE catalog_versions ADD COLUMN IF NOT EXISTS xact_id BIGINT UNIQUE;
+ALTER TABLE catalog_versions ADD COLUMN IF NOT EXISTS changed INT NOT NULL DEFAULT 0;
+CREATE TABLE IF NOT EXISTS college_changes (
+  xact_id     BIGINT NOT NULL,
+  college_id  INT NOT NULL,
+  deleted     BOOLEAN NOT NULL DEFAULT FALSE,
+  PRIMARY KEY (xact_id, college_id)
+);
+CREATE TABLE IF NOT EXISTS catalog_pending (xact_id BIGINT PRIMARY KEY);
+
+CREATE OR REPLACE FUNCTION catalog_bump(loaded BIGINT) RETURNS BIGINT LANGUAGE plpgsql AS $$
+DECLARE v BIGINT; n INT;
+BEGIN
+  PERFORM pg_advisory_xact_lock(hashtext('zpluse-seed:catalog-version'));
+  SELECT count(*) INTO n FROM college_changes WHERE xact_id = txid_current();
+  INSERT INTO catalog_versions (rows_loaded, xact_id, changed) VALUES (loaded, txid_current(), n)
+  ON CONFLICT (xact_id) DO UPDATE
+    SET rows_loaded = coalesce(EXCLUDED.rows_loaded, catalog_versions.rows_loaded), changed = n
+  RETURNING version INTO v;
+  DELETE FROM catalog_pending WHERE xact_id = txid_current();
+  PERFORM pg_notify('catalog_changed', json_build_object('version', v, 'changed', n)::text);
+  RETURN v;
+END $$;
+
+CREATE OR REPLACE FUNCTION record_college_changes() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF current_setting('seed.derived', true) = 'on' THEN
+    RETURN NULL;
+  END IF;
+  INSERT INTO college_changes (xact_id, college_id, deleted)
+  SELECT txid_current(), id, TG_OP = 'DELETE' FROM changed_rows
+  ON CONFLICT (xact_id, college_id) DO UPDATE SET deleted = EXCLUDED.deleted;
+  IF FOUND THEN
+    INSERT INTO catalog_pending VALUES (txid_current()) ON CONFLICT DO NOTHING;
+  END IF;
+  RETURN NULL;
+END $$;
+
+CREATE OR REPLACE FUNCTION catalog_commit_version() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM catalog_pending WHERE xact_id = NEW.xact_id) THEN
+    PERFORM catalog_bump(NULL);
+  END IF;
+  RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS colleges_changes_ins ON colleges;
+DROP TRIGGER IF EXISTS colleges_changes_upd ON colleges;
+DROP TRIGGER IF EXISTS colleges_changes_del ON colleges;
+CREATE TRIGGER colleges_changes_ins AFTER INSERT ON colleges
+  REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION record_college_changes();
+CREATE TRIGGER colleges_changes_upd AFTER UPDATE ON colleges
+  REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION record_college_changes();
+CREATE TRIGGER colleges_changes_del AFTER DELETE ON colleges
+  REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT EXECUTE FUNCTION record_college_changes();
+DROP TRIGGER IF EXISTS catalog_pending_commit ON catalog_pending;
+CREATE CONSTRAINT TRIGGER catalog_pending_commit AFTER INSERT ON catalog_pending
+  DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION catalog_commit_version();
+"""),
+    # Serves the geocoding merge's equality join on normalized (state, city).
+    Migration(23, "idx_colleges_place", """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_colleges_place ON colleges (lower(btrim(state)), lower(btrim(city)));
+""", concurrent_index="idx_colleges_place"),
+    # How far the derived tables (courses, encodings, geocodes) have caught up
+    # with college_changes, by catalog version.
+    Migration(24, "seed_watermarks", """
+CREATE TABLE IF NOT EXISTS seed_watermarks (
+  name        TEXT PRIMARY KEY,
+  version     BIGINT NOT NULL,
+  updated_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""),
+)
+
+MIGRATION_LEDGER_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version     INT PRIMARY KEY,
+  name        TEXT NOT NULL,
+  checksum    CHAR(64) NOT NULL,
+  applied_at  TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+"""
+
+MIGRATION_LOCK_SQL = "SELECT pg_advisory_xact_lock(hashtext('zpluse-seed:migrations'))"
+MIGRATION_APPLIED_SQL = "SELECT version, checksum FROM schema_migrations"
+MIGRATION_RECORD_SQL = """
+INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)
+ON CONFLICT (version) DO NOTHING
+"""
+# Invalid *and* not currently being built by another session.
+INVALID_INDEX_SQL = """
+SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = %s AND NOT i.indisvalid
+  AND NOT EXISTS (SELECT 1 FROM pg_stat_progress_create_index p WHERE p.index_relid = c.oid)
+"""
+
+
+class MigrationError(Exception):
+    pass
+
+
+def migration_checksum(migration):
+    normalized = " ".join(migration.sql.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _applied_migrations(conn):
+    with conn.cursor() as cur:
+        cur.execute(MIGRATION_LEDGER_SQL)
+        cur.execute(MIGRATION_APPLIED_SQL)
+        applied = dict(cur.fetchall())
+    conn.commit()
+    return applied
+
+
+def _apply_transactional(conn, migration, checksum):
+    with conn.cursor() as cur:
+        cur.execute(MIGRATION_LOCK_SQL)  # serialize concurrent seed runs
+        cur.execute(MIGRATION_APPLIED_SQL)
+        if migration.version in dict(cur.fetchall()):
+            conn.rollback()
+            return False
+        cur.execute(migration.sql)
+        cur.execute(MIGRATION_RECORD_SQL, (migration.version, migration.name, checksum))
+    conn.commit()
+    return True
+
+
+def _apply_concurrent(conn, migration, checksum):
+    # Session SET is safe only on a real session; in transaction-pooler mode
+    # autocommit statements carry no timeout in the first place.
+    session = pooler_mode() == "session"
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if session:
+                cur.execute("SET statement_timeout = 0")
+            cur.execute(INVALID_INDEX_SQL, (migration.concurrent_index,))
+            if cur.fetchone():
+                print(f"    ♻️   Dropping invalid index {migration.concurrent_index} from an interrupted build")
+                cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {migration.concurrent_index}")
+            cur.execute(migration.sql)
+            cur.execute(MIGRATION_RECORD_SQL, (migration.version, migration.name, checksum))
+            if session:
+                cur.execute("RESET statement_timeout")
+    finally:
+        conn.autocommit = False
+    return True
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Apply pending migrations in version order. Returns the versions applied."""
+    applied = _applied_migrations(conn)
+    for m in migrations:
+        if m.version in applied and applied[m.version].strip() != migration_checksum(m):
+            raise MigrationError(
+                f"migration {m.version:04d} {m.name} was changed after it was applied "
+                "(checksum mismatch); add a new migration instead"
+            )
+
+    done = []
+    for m in sorted(migrations, key=lambda m: m.version):
+        if m.version in applied:
+            continue
+        checksum = migration_checksum(m)
+        how = " (concurrently)" if m.concurrent_index else ""
+        print(f"    ▶️   {m.version:04d} {m.name}{how}")
+        with METRICS.phase(f"migrate:{m.version:04d}"):
+            if m.concurrent_index:
+                ran = _apply_concurrent(conn, m, checksum)
+            else:
+                ran = _apply_transactional(conn, m, checksum)
+        if ran:
+            done.append(m.version)
+    return done
+
+
+# ─── Catalog search (served by the indexes above) ──────────────────────────────
+# Reference queries for the API. Full-text matches use idx_colleges_search_tsv;
+# the ILIKE substring match the colleges page does today uses the trigram
+# indexes; course filters use courses @> '["M.Tech"]' on idx_colleges_courses_gin.
+SEARCH_SQL = """
+SELECT id, name, city, state, type, rating, logo_url, cover_image_url, affiliation
+FROM colleges
+WHERE search_tsv @@ websearch_to_tsquery('simple', %(q)s)
+   OR name ILIKE %(like)s
+   OR city ILIKE %(like)s
+ORDER BY ts_rank(search_tsv, websearch_to_tsquery('simple', %(q)s)) DESC,
+         similarity(name, %(q)s) DESC,
+         rating DESC NULLS LAST
+LIMIT %(limit)s
 """
 
+COURSE_FILTER_SQL = """
+SELECT id, name, city, state, type, rating, logo_url
+FROM colleges
+WHERE courses @> %s::jsonb
+ORDER BY rating DESC NULLS LAST
+LIMIT %s
+"""
+
+
+def _like_pattern(term):
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def search_colleges(conn, term, limit=20):
+    """Ranked catalog search by name, city, state, affiliation and description."""
+    with conn.cursor() as cur:
+        cur.execute(SEARCH_SQL, {"q": term, "like": _like_pattern(term), "limit": limit})
+        return cur.fetchall()
+
+
+def colleges_offering(conn, course, limit=50):
+    with conn.cursor() as cur:
+        cur.execute(COURSE_FILTER_SQL, (json.dumps([course]), limit))
+        return cur.fetchall()
+
+
 # ─── Insert SQL ────────────────────────────────────────────────────────────────
-INSERT_SQL = """
-INSERT INTO colleges
-  (name, description, city, state, country, type, established_year,
-   rating, is_featured, website, logo_url, cover_image_url,
-   fee_structure, affiliation, courses, nirf_rank)
-VALUES %s
+ON_CONFLICT_SQL = """
 ON CONFLICT (name) DO UPDATE SET
   description       = EXCLUDED.description,
   city              = EXCLUDED.city,
@@ -880,47 +2099,2809 @@ ON CONFLICT (name) DO UPDATE SET
   affiliation       = EXCLUDED.affiliation,
   courses           = EXCLUDED.courses,
   nirf_rank         = EXCLUDED.nirf_rank,
-  updated_at        = NOW();
+  content_hash      = EXCLUDED.content_hash,
+  updated_at        = NOW()
 """
 
+# Skip the UPDATE (no new tuple, no WAL, updated_at untouched) when nothing changed.
+HASH_GUARD_SQL = "WHERE colleges.content_hash IS DISTINCT FROM EXCLUDED.content_hash\n"
 
-def main():
-    print("=" * 60)
-    print("  Zpluse University — College Seed Script")
-    print(f"  Total colleges to insert/update: {len(COLLEGES)}")
-    print("=" * 60)
+_INSERT_VALUES_SQL = """
+INSERT INTO colleges
+  (name, description, city, state, country, type, established_year,
+   rating, is_featured, website, logo_url, cover_image_url,
+   fee_structure, affiliation, courses, nirf_rank, content_hash)
+VALUES %s
+"""
 
-    conn = get_connection()
-    conn.autocommit = False
-    cur = conn.cursor()
+INSERT_SQL = _INSERT_VALUES_SQL + ON_CONFLICT_SQL + HASH_GUARD_SQL + ";"
+INSERT_FORCE_SQL = _INSERT_VALUES_SQL + ON_CONFLICT_SQL + ";"
 
-    # Step 1: Migrate schema
-    print("\n📐  Applying schema migration...")
-    cur.execute(MIGRATION_SQL)
-    print("    ✅  Columns added (or already exist)")
-
-    # Step 2: Build rows (convert courses list to JSON string for JSONB column)
-    rows = []
-    for c in COLLEGES:
-        (name, description, city, state, ctype, est_year, rating, featured,
-         website, logo_url, cover_url, fee, affiliation, courses, nirf_rank) = c
-        rows.append((
-            name, description, city, state, "India", ctype, est_year,
-            rating, featured, website, logo_url, cover_url,
-            fee, affiliation, json.dumps(courses) if courses else '[]', nirf_rank
-        ))
-
-    # Step 3: Insert using execute_values for efficiency
-    print(f"\n📥  Inserting {len(rows)} college records...")
-    execute_values(cur, INSERT_SQL, rows)
+# ─── COPY staging (engine "copy") ──────────────────────────────────────────────
+# Rows are streamed into a per-transaction temp table with COPY, then merged
+# into colleges with a single set-based upsert. ON COMMIT DROP keeps this safe
+# on the transaction pooler, where the next transaction may get another backend.
+STAGE_COLUMNS = (
+    ("name", "TEXT"), ("description", "TEXT"), ("city", "TEXT"), ("state", "TEXT"),
+    ("country", "TEXT"), ("type", "TEXT"), ("established_year", "INT"),
+    ("rating", "NUMERIC"), ("is_featured", "BOOLEAN"), ("website", "TEXT"),
+    ("logo_url", "TEXT"), ("cover_image_url", "TEXT"), ("fee_structure", "TEXT"),
+    ("affiliation", "TEXT"), ("courses", "JSONB"), ("nirf_rank", "INT"),
+    ("content_hash", "TEXT"),
+)
+_STAGE_COLS = ", ".join(c for c, _ in STAGE_COLUMNS)
+ROW_INDEX = {c: i for i, (c, _) in enumerate(STAGE_COLUMNS)}  # position in a to_db_row() tuple
 
-    conn.commit()
-    cur.close()
-    conn.close()
+STAGE_CREATE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS colleges_stage (seq BIGSERIAL, "
+    + ", ".join(f"{c} {t}" for c, t in STAGE_COLUMNS)
+    + ") ON COMMIT DROP;"
+)
 
-    print(f"\n✅  Done! {len(rows)} colleges inserted/updated successfully.")
-    print("\n🌐  Visit your site to verify:")
-    print("    https://www.zpluseuniversity.com/colleges\n")
+STAGE_COPY_SQL = f"COPY colleges_stage ({_STAGE_COLS}) FROM STDIN"
+
+# DISTINCT ON keeps the last occurrence of a name, matching what sequential
+# execute_values batches would leave behind.
+_STAGE_SELECT_SQL = f"""
+INSERT INTO colleges ({_STAGE_COLS})
+SELECT DISTINCT ON (name) {_STAGE_COLS}
+FROM colleges_stage
+ORDER BY name, seq DESC
+"""
+
+STAGE_MERGE_SQL = _STAGE_SELECT_SQL + ON_CONFLICT_SQL + HASH_GUARD_SQL + ";"
+STAGE_MERGE_FORCE_SQL = _STAGE_SELECT_SQL + ON_CONFLICT_SQL + ";"
+
+STAGE_TRUNCATE_SQL = "TRUNCATE colleges_stage;"
+
+
+def _copy_field(value):
+    """Encode one value for COPY ... FROM STDIN text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def copy_buffer(rows):
+    """Render db rows as an in-memory COPY text stream."""
+    return io.StringIO("".join("\t".join(map(_copy_field, r)) + "\n" for r in rows))
+
+
+# ─── Change detection (--incremental) ──────────────────────────────────────────
+EXISTING_HASHES_SQL = "SELECT name, content_hash FROM colleges"
+
+
+def fetch_existing_hashes(conn, itersize=10000):
+    """Stream the name → content_hash map in one query via a server-side cursor."""
+    with conn.cursor(name="seed_existing_hashes") as cur:
+        cur.itersize = itersize
+        cur.execute(EXISTING_HASHES_SQL)
+        return {name: h for name, h in cur}
+
+
+class ChangeFilter:
+    """Drop rows whose content hash matches the DB and count what is left to send."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+
+    def __call__(self, rows):
+        for row in rows:
+            name, new_hash = row[0], row[-1]
+            old_hash = self.existing.get(name)
+            if old_hash == new_hash:
+                self.unchanged += 1
+                continue
+            if name in self.existing:
+                self.updated += 1
+            else:
+                self.inserted += 1
+            self.existing[name] = new_hash
+            yield row
+
+
+# ─── Reconciliation (--sync) ───────────────────────────────────────────────────
+# Pass 1 reduces the source to name → hash, one keyed scan of colleges diffs
+# against it, and pass 2 re-reads the source to send only the rows in the plan.
+# Neither side's full rows are ever held in memory.
+DELETE_BY_NAME_SQL = "DELETE FROM colleges WHERE name = ANY(%s)"
+
+PLAN_SAMPLE = 10
+
+
+class SyncPlan:
+    def __init__(self, source_hashes):
+        self.source_hashes = source_hashes
+        self.inserts = set(source_hashes)
+        self.updates = set()
+        self.deletes = []
+        self.unchanged = 0
+        self.invalid = 0
+        self.inserted = 0
+        self.updated = 0
+        self.not_sent = set()
+
+    @classmethod
+    def build(cls, conn, rows, itersize=10000):
+        # Records whose name fails validation can't be matched to a row (the
+        # Validator rejects them from the load too); count them, don't plan them.
+        name_rules = [(check, arg) for field, check, arg in VALIDATION_RULES if field == "name"]
+        source_hashes = {}
+        invalid = 0
+        for row in rows:
+            if any(value_problem(check, arg, row[0]) for check, arg in name_rules):
+                invalid += 1
+                continue
+            source_hashes[row[0]] = row[-1]
+        plan = cls(source_hashes)
+        plan.invalid = invalid
+
+        with conn.cursor(name="seed_sync_scan") as cur:
+            cur.itersize = itersize
+            cur.execute(EXISTING_HASHES_SQL)
+            for name, db_hash in cur:
+                src_hash = source_hashes.get(name)
+                if src_hash is None:
+                    plan.deletes.append(name)
+                    continue
+                plan.inserts.discard(name)
+                if src_hash == db_hash:
+                    plan.unchanged += 1
+                else:
+                    plan.updates.add(name)
+        return plan
+
+    @property
+    def is_empty(self):
+        return not (self.inserts or self.updates or self.deletes)
+
+    def rows(self, rows):
+        """
+        Yield only planned rows, once per name, taking the last occurrence in
+        the source. `inserted`/`updated` count what was actually yielded;
+        planned names that never arrive (rejected by the Validator, or dropped
+        by --dedupe skip) are left in `not_sent`.
+        """
+        pending = self.inserts | self.updates
+        for row in rows:
+            name = row[0]
+            if name in pending and row[-1] == self.source_hashes[name]:
+                pending.discard(name)
+                if name in self.inserts:
+                    self.inserted += 1
+                else:
+                    self.updated += 1
+                yield row
+        self.not_sent = pending
+
+    def apply_deletes(self, cur, batch_size):
+        for batch in chunked(self.deletes, batch_size):
+            cur.execute(DELETE_BY_NAME_SQL, (batch,))
+
+    def print(self):
+        print(f"    ➕  insert:    {len(self.inserts):,}")
+        print(f"    ✏️   update:    {len(self.updates):,}")
+        print(f"    🗑️   delete:    {len(self.deletes):,}")
+        print(f"    💤  unchanged: {self.unchanged:,}")
+        if self.invalid:
+            print(f"    ⚠️   invalid name (not planned): {self.invalid:,}")
+        for label, names in (("insert", self.inserts), ("update", self.updates), ("delete", self.deletes)):
+            sample = sorted(names, key=str)[:PLAN_SAMPLE]
+            for name in sample:
+                print(f"        {label:<6}  {name}")
+            if len(names) > len(sample):
+                print(f"        {label:<6}  … and {len(names) - len(sample):,} more")
+
+    def print_applied(self, why):
+        print(f"    ➕ {self.inserted:,} inserted · ✏️  {self.updated:,} updated · "
+              f"🗑️  {len(self.deletes):,} deleted · 💤 {self.unchanged:,} unchanged")
+        if not self.not_sent:
+            return
+        print(f"    🚫  {len(self.not_sent):,} planned row(s) not applied ({why})")
+        sample = sorted(self.not_sent, key=str)[:PLAN_SAMPLE]
+        for name in sample:
+            print(f"        {'skip':<6}  {name}")
+        if len(self.not_sent) > len(sample):
+            print(f"        {'skip':<6}  … and {len(self.not_sent) - len(sample):,} more")
+
+
+# ─── Entity resolution (--dedupe) ──────────────────────────────────────────────
+# A pre-pass over the source (plus the names already in colleges) that finds
+# records naming the same college:
+#   exact  same `name` more than once — the upsert keeps the last occurrence
+#   near   "IIT BHU Varanasi" ≈ "Indian Institute of Technology (BHU) Varanasi"
+# Names are normalised (ASCII-folded, abbreviations expanded, stopwords
+# dropped) and blocked on (city or state, name token): only records sharing a
+# block are compared, and blocks over DEDUPE_BLOCK_MAX records (common words
+# like "university") are skipped, so comparisons grow ~linearly with N.
+# Candidates scoring ≥ the threshold on typo-tolerant token Jaccard are
+# clustered with union-find. A cluster's survivor is the existing colleges
+# row if there is one, else the name that appears first in the source.
+NAME_ABBREVIATIONS = {
+    "iit": "indian institute technology",
+    "iiit": "indian institute information technology",
+    "nit": "national institute technology",
+    "iim": "indian institute management",
+    "iisc": "indian institute science",
+    "iiser": "indian institute science education research",
+    "aiims": "all india institute medical sciences",
+    "nlu": "national law university",
+    "univ": "university",
+    "uni": "university",
+    "inst": "institute",
+    "tech": "technology",
+    "engg": "engineering",
+    "mgmt": "management",
+    "coll": "college",
+}
+DEDUPE_THRESHOLD = 0.85
+DEDUPE_TOKEN_RATIO = 0.85
+DEDUPE_BLOCK_MAX = 50
+EXISTING_LOCATIONS_SQL = "SELECT name, city, state FROM colleges"
+
+
+def dedupe_batch(chunk):
+    """Keep the last row per name so one statement never touches the same row twice."""
+    i = ROW_INDEX["name"]
+    last = {row[i]: n for n, row in enumerate(chunk)}
+    if len(last) == len(chunk):
+        return chunk
+    METRICS.add("rows_deduped", len(chunk) - len(last))
+    return [row for n, row in enumerate(chunk) if last[row[i]] == n]
+
+
+def ordered_batch(chunk):
+    """
+    dedupe_batch() then sort by name: every writer then takes row locks on
+    colleges in the same (index) order, so two concurrent loads block briefly
+    instead of deadlocking. The COPY merge already orders by name.
+    """
+    i = ROW_INDEX["name"]
+    return sorted(dedupe_batch(chunk), key=lambda row: row[i])
+
+
+def name_tokens(name):
+    tokens = []
+    for term in search_terms(name):
+        tokens.extend(NAME_ABBREVIATIONS.get(term, term).split())
+    return [t for t in tokens if t not in SEARCH_STOPWORDS]
+
+
+def name_similarity(a, b, threshold=DEDUPE_THRESHOLD):
+    """
+    Token Jaccard of two name token sets in [0, 1], where tokens of 4+
+    letters also match with a typo (difflib ratio ≥ DEDUPE_TOKEN_RATIO).
+    Names that differ in a number ("Campus 2", "#14") are never similar, and
+    the typo search is skipped when even a full match could not reach `threshold`.
+    """
+    sa, sb = frozenset(a), frozenset(b)
+    if not sa or not sb:
+        return 0.0
+    only_a, only_b = sa - sb, set(sb - sa)
+    if any(t.isdigit() for t in only_a) or any(t.isdigit() for t in only_b):
+        return 0.0
+    matched = len(sa & sb)
+    best = matched + min(len(only_a), len(only_b))
+    if best / (len(sa) + len(sb) - best) < threshold:
+        return matched / (len(sa) + len(sb) - matched)
+    for t in only_a:
+        for u in only_b:
+            if len(t) > 3 and len(u) > 3 and \
+                    difflib.SequenceMatcher(None, t, u).ratio() >= DEDUPE_TOKEN_RATIO:
+                matched += 1
+                only_b.discard(u)
+                break
+    return matched / (len(sa) + len(sb) - matched)
+
+
+class EntityResolver:
+    """
+    Collects (name, city, state) for every record, then resolve() builds
+    clusters. skip() drops everything but each cluster's survivor.
+    """
+
+    def __init__(self, threshold=DEDUPE_THRESHOLD, block_max=DEDUPE_BLOCK_MAX):
+        self.threshold = threshold
+        self.block_max = block_max
+        self.names = []       # record number → name; existing rows first, then source positions
+        self.tokens = []
+        self.locations = []
+        self.existing = 0
+        self.last_position = {}
+        self.first_position = {}
+        self.clusters = []    # [(survivor, [(record, score), ...])]
+        self.exact = 0
+        self.compared = 0
+        self.skipped_blocks = 0
+        self.drop = set()     # source positions to skip
+
+    def _add(self, name, city, state):
+        self.names.append(name)
+        self.tokens.append(frozenset(name_tokens(name)))
+        self.locations.append((city or state or "").strip().lower())
+
+    def add_existing(self, conn, itersize=10000):
+        with conn.cursor(name="seed_dedupe_scan") as cur:
+            cur.itersize = itersize
+            cur.execute(EXISTING_LOCATIONS_SQL)
+            for name, city, state in cur:
+                self._add(name, city, state)
+        self.existing = len(self.names)
+
+    def add_source(self, records):
+        for position, c in enumerate(records):
+            name, city, state = c.name, c.city, c.state
+            if name in self.last_position:
+                self.exact += 1
+                self.drop.add(self.last_position[name])  # the upsert keeps the last one
+            self.last_position[name] = position
+            self.first_position.setdefault(name, position)
+            self._add(name, city, state)
+
+    def _position(self, record):
+        return record - self.existing
+
+    def _seniority(self, record):
+        if record < self.existing:
+            return (0, record)
+        return (1, self.first_position[self.names[record]])
+
+    def resolve(self):
+        # Exact duplicates are settled already; block only each name's last record.
+        live = set(range(self.existing))
+        live.update(self.existing + p for p in self.last_position.values())
+        existing_names = set(self.names[:self.existing])
+        live.difference_update(self.existing + p for n, p in self.last_position.items()
+                               if n in existing_names)
+
+        blocks = defaultdict(list)
+        for r in sorted(live):
+            for token in set(self.tokens[r]):
+                blocks[(self.locations[r], token)].append(r)
+
+        parent = {}
+
+        def find(r):
+            while parent.get(r, r) != r:
+                parent[r] = parent.get(parent[r], parent[r])
+                r = parent[r]
+            return r
+
+        scores, seen = {}, set()
+        for members in blocks.values():
+            if len(members) > self.block_max:
+                self.skipped_blocks += 1
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    if (a, b) in seen or (a < self.existing and b < self.existing):
+                        continue
+                    seen.add((a, b))
+                    self.compared += 1
+                    score = name_similarity(self.tokens[a], self.tokens[b], self.threshold)
+                    if score >= self.threshold:
+                        ra, rb = find(a), find(b)
+                        if ra != rb:
+                            parent[max(ra, rb)] = min(ra, rb)
+                        scores[b] = max(scores.get(b, 0.0), score)
+                        scores[a] = max(scores.get(a, 0.0), score)
+
+        members_of = defaultdict(list)
+        for r in parent:
+            members_of[find(r)].append(r)
+        for root, members in sorted(members_of.items()):
+            members = sorted(set(members) | {root}, key=self._seniority)
+            survivor, rest = members[0], members[1:]
+            self.clusters.append((survivor, [(r, scores.get(r, 0.0)) for r in rest]))
+            self.drop.update(self._position(r) for r in rest if r >= self.existing)
+        return self.clusters
+
+    def skip(self, records, start=0):
+        """Yield source records (numbered from `start`) that are not duplicates."""
+        for position, record in enumerate(records, start):
+            if position in self.drop:
+                METRICS.add("rows_deduped")
+                continue
+            yield record
+
+    def _label(self, record):
+        if record < self.existing:
+            return {"name": self.names[record], "existing": True}
+        return {"name": self.names[record], "position": self._position(record)}
+
+    def report(self):
+        return {
+            "threshold": self.threshold,
+            "records": len(self.names) - self.existing,
+            "existing": self.existing,
+            "exact_duplicates": self.exact,
+            "comparisons": self.compared,
+            "skipped_blocks": self.skipped_blocks,
+            "clusters": [
+                {"survivor": self._label(s),
+                 "duplicates": [dict(self._label(r), score=round(score, 3)) for r, score in rest]}
+                for s, rest in self.clusters
+            ],
+        }
+
+    def print(self):
+        print(f"    🔁  exact duplicates:  {self.exact:,}")
+        print(f"    🧩  near-dup clusters: {len(self.clusters):,} "
+              f"({self.compared:,} comparisons, {self.skipped_blocks:,} oversized blocks skipped)")
+        for survivor, rest in self.clusters[:PLAN_SAMPLE]:
+            print(f"        keep    {self.names[survivor]}{' (in DB)' if survivor < self.existing else ''}")
+            for r, score in rest:
+                print(f"          ≈ {score:.2f}  {self.names[r]}")
+        if len(self.clusters) > PLAN_SAMPLE:
+            print(f"        … and {len(self.clusters) - PLAN_SAMPLE:,} more clusters")
+
+
+# ─── Course normalization (course_dictionary + college_courses) ────────────────
+# Free-text labels ("MBA (SJMSOM)", "LL.B", "Ph.D (FPM)") are reduced to a
+# canonical course: parenthetical qualifiers are dropped, a slug of the
+# remaining letters/digits is the dictionary key, and COURSE_ALIASES folds
+# genuinely equivalent programmes together. Triples for each batch of
+# changed colleges (see Derived tables) are spooled to a temp file as the rows
+# stream past, then merged set-based.
+COURSE_ALIASES = {
+    "btech+mtech": "Dual Degree",
+    "idd": "Dual Degree",
+    "emba": "Executive MBA",
+    "masterofdesign": "M.Des",
+    "llb": "LLB",
+    "llm": "LLM",
+    "phd": "Ph.D",
+}
+
+_DOCTORAL = ("phd", "fpm", "fellowprogramme", "mphil")
+_UG_EXCEPTIONS = ("mbbs", "llb", "law")
+_PG_PREFIXES = (
+    "m", "pg", "executive", "epgp", "emba", "llm", "dm", "imba", "gmp", "nmp", "ipmx",
+)
+SPOOL_MAX = 32 * 2**20  # bytes kept in memory before the spool moves to disk
+
+COURSE_STAGE_CREATE_SQL = "CREATE TEMP TABLE IF NOT EXISTS course_stage (name TEXT, slug TEXT, course TEXT, level TEXT) ON COMMIT DROP;"
+COURSE_STAGE_COPY_SQL = "COPY course_stage (name, slug, course, level) FROM STDIN"
+
+COURSE_MERGE_SQL = """
+ANALYZE course_stage;
+
+INSERT INTO course_dictionary (slug, name, level)
+SELECT DISTINCT ON (slug) slug, course, level
+FROM course_stage WHERE slug IS NOT NULL
+ORDER BY slug, course
+ON CONFLICT (slug) DO NOTHING;
+
+DELETE FROM college_courses cc
+USING colleges c
+WHERE cc.college_id = c.id
+  AND c.name IN (SELECT name FROM course_stage)
+  AND NOT EXISTS (
+    SELECT 1 FROM course_stage s JOIN course_dictionary d ON d.slug = s.slug
+    WHERE s.name = c.name AND d.id = cc.course_id
+  );
+
+INSERT INTO college_courses (college_id, course_id)
+SELECT DISTINCT c.id, d.id
+FROM course_stage s
+JOIN colleges c ON c.name = s.name
+JOIN course_dictionary d ON d.slug = s.slug
+ON CONFLICT DO NOTHING;
+"""
+
+COLLEGES_BY_COURSE_SQL = """
+SELECT c.id, c.name, c.city, c.state
+FROM course_dictionary d
+JOIN college_courses cc ON cc.course_id = d.id
+JOIN colleges c ON c.id = cc.college_id
+WHERE d.slug = %s AND (%s::text IS NULL OR c.state = %s)
+ORDER BY c.rating DESC NULLS LAST
+"""
+
+
+def course_slug(label):
+    return re.sub(r"[^a-z0-9+]", "", label.lower())
+
+
+def course_level(slug):
+    if slug.startswith(_DOCTORAL) or "phd" in slug:
+        return "Doctoral"
+    if slug.startswith("certificate") or slug.endswith("diploma") and not slug.startswith("pg"):
+        return "Certificate"
+    if "dual" in slug or "integrated" in slug or slug in ("ipm", "bsmsdualdegree"):
+        return "Integrated"
+    if slug in _UG_EXCEPTIONS or slug.startswith("b"):
+        return "UG"
+    if slug.startswith(_PG_PREFIXES):
+        return "PG"
+    return None
+
+
+def canonical_course(label):
+    """Return (slug, display name, level) for a free-text course label."""
+    base = " ".join(re.sub(r"\s*\([^)]*\)", "", label).split()) or label.strip()
+    name = COURSE_ALIASES.get(course_slug(base), base)
+    slug = course_slug(name)
+    return slug, name, course_level(slug)
+
+
+class CourseTap:
+    """Spool (college, course) pairs for rows as they stream past; merge them with apply()."""
+
+    def __init__(self):
+        self.spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, mode="w+", encoding="utf-8")
+        self.colleges = 0
+        self._cache = {}
+
+    def __call__(self, rows):
+        i_name, i_courses = ROW_INDEX["name"], ROW_INDEX["courses"]
+        for row in rows:
+            name = row[i_name]
+            labels = json.loads(row[i_courses] or "[]")
+            entries = set()
+            for label in labels:
+                canon = self._cache.get(label)
+                if canon is None:
+                    canon = self._cache[label] = canonical_course(label)
+                entries.add(canon)
+            # A course-less college still gets a row so its stale pairs are removed.
+            for slug, course, level in entries or {(None, None, None)}:
+                self.spool.write("\t".join(map(_copy_field, (name, slug, course, level))) + "\n")
+            self.colleges += 1
+            yield row
+
+    def apply(self, conn):
+        """Merge spooled pairs into course_dictionary / college_courses (caller commits)."""
+        self.spool.seek(0)
+        with conn.cursor() as cur:
+            cur.execute(COURSE_STAGE_CREATE_SQL)
+            cur.copy_expert(COURSE_STAGE_COPY_SQL, self.spool)
+            cur.execute(COURSE_MERGE_SQL)
+        self.spool.close()
+
+
+def colleges_by_course(conn, course, state=None):
+    """e.g. colleges_by_course(conn, "M.Tech", "Tamil Nadu") — an index join, no JSON unpacking."""
+    slug = canonical_course(course)[0]
+    with conn.cursor() as cur:
+        cur.execute(COLLEGES_BY_COURSE_SQL, (slug, state, state))
+        return cur.fetchall()
+
+
+# ─── Accreditation + fee encoding ──────────────────────────────────────────────
+# affiliation "NAAC A++ | UGC | AIU Member" becomes an ordered INT[] of
+# accreditation_tokens ids (splitting on " | " and joining back is exact, so
+# the text is always reconstructable); fee_structure "₹1.5L-2L/year (B.Tech)"
+# becomes a fee_schedules id plus fee_min_inr/fee_max_inr/fee_period for
+# indexed range filters. Same spool-then-merge shape as CourseTap.
+AFFILIATION_SEPARATOR = " | "
+
+ACCREDITATION_KINDS = (
+    ("naac", re.compile(r"^NAAC\b")),
+    ("ugc", re.compile(r"^UGC\b")),
+    ("aiu", re.compile(r"^AIU\b")),
+    ("ranking", re.compile(r"^(NIRF|QS|FT)\b")),
+    ("international", re.compile(r"^(AACSB|AMBA|EQUIS)\b")),
+    ("regulator", re.compile(r"^(AICTE|Bar Council|MCI|NMC)\b")),
+    ("government", re.compile(r"^(Ministry|DAE|DST|Institute of|National)\b")),
+)
+NAAC_GRADE_RE = re.compile(r"^NAAC\s+([A-C](?:\+\+|\+)?)$")
+
+_FEE_AMOUNT = r"(\d[\d,]*(?:\.\d+)?)\s*(K|L|Cr)?"
+FEE_RE = re.compile(
+    rf"₹\s*{_FEE_AMOUNT}(?:\s*-\s*{_FEE_AMOUNT})?(?:\s*/\s*(year|yr|semester|sem|month))?",
+    re.IGNORECASE,
+)
+FEE_PROGRAMME_RE = re.compile(r"\(\s*\d+(?:\.\d+)?\s*-?\s*yr", re.IGNORECASE)
+FEE_UNITS = {"k": 1_000, "l": 100_000, "cr": 10_000_000}
+FEE_PERIODS = {"yr": "year", "sem": "semester"}
+
+_ENCODING_COLS = "n, name, ord, token, kind, naac_grade, fee, fee_min, fee_max, fee_period"
+ENCODING_STAGE_CREATE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS encoding_stage (n BIGINT, name TEXT, ord INT, token TEXT, "
+    "kind TEXT, naac_grade TEXT, fee TEXT, fee_min INT, fee_max INT, fee_period TEXT) ON COMMIT DROP;"
+)
+ENCODING_STAGE_COPY_SQL = f"COPY encoding_stage ({_ENCODING_COLS}) FROM STDIN"
+
+# The last occurrence of a name wins, matching the upsert. Only values missing
+# from the dictionaries are inserted: ON CONFLICT alone would still draw a
+# sequence value for every staged row that already exists. It stays as the
+# backstop for a concurrent run inserting the same value.
+ENCODING_MERGE_SQL = """
+ANALYZE encoding_stage;
+
+INSERT INTO accreditation_tokens (token, kind)
+SELECT DISTINCT s.token, s.kind FROM encoding_stage s
+WHERE s.token IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM accreditation_tokens t WHERE t.token = s.token)
+ON CONFLICT (token) DO NOTHING;
+
+INSERT INTO fee_schedules (text)
+SELECT DISTINCT s.fee FROM encoding_stage s
+WHERE s.fee IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM fee_schedules f WHERE f.text = s.fee)
+ON CONFLICT (text) DO NOTHING;
+
+UPDATE colleges c SET
+  accreditation_ids = e.accreditation_ids,
+  naac_grade        = e.naac_grade,
+  fee_schedule_id   = e.fee_schedule_id,
+  fee_min_inr       = e.fee_min,
+  fee_max_inr       = e.fee_max,
+  fee_period        = e.fee_period
+FROM (
+  SELECT s.name,
+         array_agg(t.id ORDER BY s.ord) FILTER (WHERE t.id IS NOT NULL) AS accreditation_ids,
+         min(s.naac_grade) AS naac_grade, min(f.id) AS fee_schedule_id,
+         min(s.fee_min) AS fee_min, min(s.fee_max) AS fee_max, min(s.fee_period) AS fee_period
+  FROM encoding_stage s
+  JOIN (SELECT name, max(n) AS n FROM encoding_stage GROUP BY name) latest USING (name, n)
+  LEFT JOIN accreditation_tokens t ON t.token = s.token
+  LEFT JOIN fee_schedules f ON f.text = s.fee
+  GROUP BY s.name
+) e
+WHERE c.name = e.name
+  AND (c.accreditation_ids, c.naac_grade, c.fee_schedule_id, c.fee_min_inr, c.fee_max_inr, c.fee_period)
+      IS DISTINCT FROM
+      (e.accreditation_ids, e.naac_grade, e.fee_schedule_id, e.fee_min, e.fee_max, e.fee_period);
+"""
+
+# Overlap test: a college charging ₹1L–3L matches a ₹2L–5L budget.
+FEE_RANGE_SQL = """
+SELECT c.id, c.name, c.city, c.state, f.text, c.fee_min_inr, c.fee_max_inr, c.fee_period
+FROM colleges c
+JOIN fee_schedules f ON f.id = c.fee_schedule_id
+WHERE c.fee_min_inr <= %(high)s AND c.fee_max_inr >= %(low)s
+  AND (%(period)s::text IS NULL OR c.fee_period = %(period)s)
+ORDER BY c.fee_min_inr, c.rating DESC NULLS LAST
+LIMIT %(limit)s
+"""
+
+ACCREDITED_SQL = """
+SELECT c.id, c.name, c.city, c.state, c.naac_grade
+FROM colleges c
+WHERE c.accreditation_ids @> ARRAY[(SELECT id FROM accreditation_tokens WHERE token = %s)]
+ORDER BY c.rating DESC NULLS LAST
+LIMIT %s
+"""
+
+
+def split_affiliation(text):
+    """Tokens in order; AFFILIATION_SEPARATOR.join(tokens) == text for any non-blank text."""
+    return [] if _blank(text) else text.split(AFFILIATION_SEPARATOR)
+
+
+def accreditation_kind(token):
+    for kind, pattern in ACCREDITATION_KINDS:
+        if pattern.match(token.strip()):
+            return kind
+    return "status"
+
+
+def naac_grade(tokens):
+    for token in tokens:
+        m = NAAC_GRADE_RE.match(token.strip())
+        if m:
+            return m.group(1)
+    return None
+
+
+def _fee_amount(number, unit):
+    value = float(number.replace(",", "")) * FEE_UNITS.get((unit or "").lower(), 1)
+    return int(round(value))
+
+
+def parse_fee(text):
+    """"₹1.2L-2L/year" → (120000, 200000, "year"); unparseable text → (None, None, None)."""
+    m = None if _blank(text) else FEE_RE.search(text)
+    if m is None:
+        return None, None, None
+    low_num, low_unit, high_num, high_unit, period = m.groups()
+    low = _fee_amount(low_num, low_unit or high_unit)
+    high = _fee_amount(high_num, high_unit or low_unit) if high_num else low
+    if period:
+        period = FEE_PERIODS.get(period.lower(), period.lower())
+    elif FEE_PROGRAMME_RE.search(text):
+        period = "programme"
+    return min(low, high), max(low, high), period
+
+
+class EncodingTap:
+    """Spool accreditation tokens and parsed fees for rows as they stream past; merge with apply()."""
+
+    def __init__(self):
+        self.spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, mode="w+", encoding="utf-8")
+        self.colleges = 0
+        self._kinds = {}
+        self._fees = {}
+
+    def __call__(self, rows):
+        i_name, i_aff, i_fee = ROW_INDEX["name"], ROW_INDEX["affiliation"], ROW_INDEX["fee_structure"]
+        for row in rows:
+            name, fee = row[i_name], row[i_fee]
+            tokens = split_affiliation(row[i_aff])
+            parsed = self._fees.get(fee)
+            if parsed is None:
+                parsed = self._fees[fee] = parse_fee(fee)
+            college = (naac_grade(tokens), fee) + parsed
+            # A college with no tokens still gets a row so its encoding is cleared.
+            for ord_, token in enumerate(tokens) if tokens else [(None, None)]:
+                kind = None
+                if token is not None:
+                    kind = self._kinds.get(token)
+                    if kind is None:
+                        kind = self._kinds[token] = accreditation_kind(token)
+                fields = (self.colleges, name, ord_, token, kind) + college
+                self.spool.write("\t".join(map(_copy_field, fields)) + "\n")
+            self.colleges += 1
+            yield row
+
+    def apply(self, conn):
+        """Merge spooled encodings into accreditation_tokens / fee_schedules / colleges (caller commits)."""
+        self.spool.seek(0)
+        with conn.cursor() as cur:
+            cur.execute(ENCODING_STAGE_CREATE_SQL)
+            cur.copy_expert(ENCODING_STAGE_COPY_SQL, self.spool)
+            cur.execute(ENCODING_MERGE_SQL)
+        self.spool.close()
+
+
+def colleges_in_fee_range(conn, low, high, period=None, limit=50):
+    """e.g. colleges_in_fee_range(conn, 100_000, 300_000, "year") — served by idx_colleges_fee_range."""
+    with conn.cursor() as cur:
+        cur.execute(FEE_RANGE_SQL, {"low": low, "high": high, "period": period, "limit": limit})
+        return cur.fetchall()
+
+
+def colleges_with_accreditation(conn, token, limit=50):
+    """e.g. colleges_with_accreditation(conn, "NAAC A++") — served by idx_colleges_accreditation_gin."""
+    with conn.cursor() as cur:
+        cur.execute(ACCREDITED_SQL, (token, limit))
+        return cur.fetchall()
+
+
+# ─── Offline geocoding (india_gazetteer.csv) ───────────────────────────────────
+# city/state pairs resolve against the bundled gazetteer: exact city + state,
+# then an alias ("Bangalore", "Trichy"), then a city name that is unique
+# across states, then the state's centroid (geo_precision "state"). Lookups
+# are memoized, and only the distinct places seen in the stream are staged,
+# keyed the way the merge matches them: lower(btrim(...)), NULL when blank.
+# The merge is a plain equality join on both keys (idx_colleges_place), plus
+# separate passes for rows missing the city or the state, so no row needs
+# IS NOT DISTINCT FROM (which rules out hash and merge joins).
+# "Near me" = geohash cells covering the radius's bounding box (btree prefix
+# scans) → bounding-box filter → haversine distance.
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "india_gazetteer.csv")
+GEOHASH_PRECISION = 8
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_MAX_CELLS = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+GEO_STAGE_CREATE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS geo_stage (city TEXT, state TEXT, latitude FLOAT8, "
+    "longitude FLOAT8, geohash TEXT, geo_precision TEXT) ON COMMIT DROP;"
+)
+GEO_STAGE_COPY_SQL = "COPY geo_stage (city, state, latitude, longitude, geohash, geo_precision) FROM STDIN"
+GEO_MERGE_SQL = """
+UPDATE colleges c SET
+  latitude      = g.latitude,
+  longitude     = g.longitude,
+  geohash       = g.geohash,
+  geo_precision = g.geo_precision
+FROM geo_stage g
+WHERE {match}
+  AND (c.latitude, c.longitude, c.geohash, c.geo_precision)
+      IS DISTINCT FROM (g.latitude, g.longitude, g.geohash, g.geo_precision);
+"""
+GEO_MATCH_PLACE = (
+    "g.city IS NOT NULL AND g.state IS NOT NULL "
+    "AND lower(btrim(c.state)) = g.state AND lower(btrim(c.city)) = g.city"
+)
+GEO_MATCH_STATE = (
+    "g.city IS NULL AND g.state IS NOT NULL "
+    "AND lower(btrim(c.state)) = g.state AND coalesce(btrim(c.city), '') = ''"
+)
+# Not indexed: only run when the stream had rows without a state.
+GEO_MATCH_CITY = (
+    "g.state IS NULL AND g.city IS NOT NULL "
+    "AND lower(btrim(c.city)) = g.city AND coalesce(btrim(c.state), '') = ''"
+)
+
+NEAR_SQL = """
+SELECT id, name, city, state, latitude, longitude, distance_km
+FROM (
+  SELECT id, name, city, state, latitude, longitude,
+         2 * %(earth)s * asin(sqrt(
+           power(sin(radians(latitude - %(lat)s) / 2), 2) +
+           cos(radians(%(lat)s)) * cos(radians(latitude)) * power(sin(radians(longitude - %(lon)s) / 2), 2)
+         )) AS distance_km
+  FROM colleges
+  WHERE ({cells})
+    AND latitude BETWEEN %(min_lat)s AND %(max_lat)s
+    AND longitude BETWEEN %(min_lon)s AND %(max_lon)s
+) near
+WHERE distance_km <= %(radius)s
+ORDER BY distance_km, id
+LIMIT %(limit)s
+"""
+
+
+def geohash_encode(lat, lon, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = value << 1 | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_BASE32[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision):
+    """(lat degrees, lon degrees) spanned by one cell."""
+    lon_bits = (5 * precision + 1) // 2
+    return 180.0 / 2 ** (5 * precision - lon_bits), 360.0 / 2 ** lon_bits
+
+
+def geohash_cover(min_lat, min_lon, max_lat, max_lon, max_cells=GEOHASH_MAX_CELLS):
+    """The finest geohash cells (at most max_cells) that together cover a bounding box."""
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lon_step = geohash_cell_size(precision)
+        if (max_lat - min_lat) / lat_step + 2 > max_cells or (max_lon - min_lon) / lon_step + 2 > max_cells:
+            continue
+        cells = set()
+        lat = min_lat
+        while True:
+            lon = min_lon
+            while True:
+                cells.add(geohash_encode(lat, lon, precision))
+                if lon >= max_lon:
+                    break
+                lon = min(lon + lon_step, max_lon)
+            if lat >= max_lat:
+                break
+            lat = min(lat + lat_step, max_lat)
+        if len(cells) <= max_cells:
+            return sorted(cells)
+    return [""]
+
+
+def _geo_key(value):
+    """The merge's join key for a city or state: lower(btrim(value)), or None when blank."""
+    key = (value or "").strip(" ").lower()
+    return key or None
+
+
+def _place_key(value):
+    return re.sub(r"[^a-z0-9]", "", (value or "").lower().replace("&", "and"))
+
+
+class Gazetteer:
+    """Memoized (city, state) → (lat, lon, precision) over the bundled CSV."""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.cities = {}
+        self.by_city = defaultdict(list)
+        self.states = {}
+        self.state_alias = {}
+        self._cache = {}
+        with _open_text(path) as fh:
+            for rec in csv.DictReader(fh):
+                point = (float(rec["latitude"]), float(rec["longitude"]))
+                state = _place_key(rec["state"])
+                aliases = [a for a in (rec.get("aliases") or "").split(";") if a.strip()]
+                if not rec["city"].strip():
+                    self.states[state] = point
+                    for alias in aliases:
+                        self.state_alias[_place_key(alias)] = state
+                    continue
+                for city in [rec["city"]] + aliases:
+                    self.cities[(_place_key(city), state)] = point
+                    self.by_city[_place_key(city)].append(point)
+
+    def lookup(self, city, state):
+        key = (city, state)
+        if key not in self._cache:
+            self._cache[key] = self._resolve(city, state)
+        return self._cache[key]
+
+    def _resolve(self, city, state):
+        c, s = _place_key(city), _place_key(state)
+        s = self.state_alias.get(s, s)
+        point = self.cities.get((c, s))
+        if point is None and len(self.by_city.get(c, ())) == 1:
+            point = self.by_city[c][0]
+        if point is not None:
+            return point + ("city",)
+        if s in self.states:
+            return self.states[s] + ("state",)
+        return None
+
+
+class GeoTap:
+    """Collect the distinct places streamed past; geocode and merge them with apply()."""
+
+    def __init__(self):
+        self.places = {}  # (city key, state key) -> first (city, state) seen
+
+    def __call__(self, rows):
+        i_city, i_state = ROW_INDEX["city"], ROW_INDEX["state"]
+        for row in rows:
+            city, state = row[i_city], row[i_state]
+            self.places.setdefault((_geo_key(city), _geo_key(state)), (city, state))
+            yield row
+
+    def apply(self, conn, gazetteer):
+        """Geocode and merge (caller commits). Returns the places that did not resolve."""
+        buf = io.StringIO()
+        unresolved = []
+        for (city_key, state_key), (city, state) in sorted(
+            self.places.items(), key=lambda p: (p[0][0] or "", p[0][1] or "")
+        ):
+            # Spellings sharing a key share a _place_key, so any one of them resolves the same.
+            found = gazetteer.lookup(city, state)
+            if found is None:
+                unresolved.append((city, state))
+                lat = lon = geohash = precision = None
+            else:
+                lat, lon, precision = found
+                geohash = geohash_encode(lat, lon)
+            buf.write("\t".join(map(_copy_field, (city_key, state_key, lat, lon, geohash, precision))) + "\n")
+        buf.seek(0)
+        keys = self.places.keys()
+        passes = [GEO_MATCH_PLACE]
+        if any(c is None and s is not None for c, s in keys):
+            passes.append(GEO_MATCH_STATE)
+        if any(s is None and c is not None for c, s in keys):
+            passes.append(GEO_MATCH_CITY)
+        with conn.cursor() as cur:
+            cur.execute(GEO_STAGE_CREATE_SQL)
+            cur.copy_expert(GEO_STAGE_COPY_SQL, buf)
+            cur.execute("ANALYZE geo_stage")
+            for match in passes:
+                cur.execute(GEO_MERGE_SQL.format(match=match))
+        return unresolved
+
+
+def colleges_near(conn, lat, lon, radius_km=25.0, limit=20):
+    """Colleges within radius_km of (lat, lon), nearest first: [(id, name, city, state, lat, lon, km), ...]."""
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    box = (max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0))
+    cells = geohash_cover(*box)
+    sql = NEAR_SQL.format(cells=" OR ".join(["geohash LIKE %(cell{})s".format(i) for i in range(len(cells))]))
+    params = {f"cell{i}": cell + "%" for i, cell in enumerate(cells)}
+    params.update(earth=EARTH_RADIUS_KM, lat=lat, lon=lon, radius=radius_km, limit=limit,
+                  min_lat=box[0], min_lon=box[1], max_lat=box[2], max_lon=box[3])
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.fetchall()
+
+
+# ─── Similar colleges (--similar K) ────────────────────────────────────────────
+# Each college becomes a hashed TF-IDF vector (SIMILAR_DIMS float32 columns,
+# signed feature hashing) over description words, canonical courses, type,
+# state and accreditation tokens. Cosine top-k comes from X[block] @ X.T,
+# with the block height chosen so one block of scores stays under
+# SIMILAR_BLOCK_BYTES, so peak memory is N × SIMILAR_DIMS × 4 plus that. The
+# matrix is filled row by row straight from the cursor; IDF (over hashed
+# columns) and the row norms are then applied in place, a block at a time.
+# Needs NumPy (pip install numpy); nothing else in the seeder does.
+SIMILAR_DIMS = 1024
+SIMILAR_BLOCK_BYTES = 64 * 2**20
+SIMILAR_DEFAULT_K = 10
+SIMILAR_WEIGHTS = {"desc": 1.0, "course": 1.5, "type": 1.0, "state": 0.5, "acc": 1.5}
+
+SIMILAR_COUNT_SQL = "SELECT count(*) FROM colleges"
+SIMILAR_ID_RANGE = (-2**31, 2**31 - 1)  # the first and last merge batches are open-ended
+SIMILAR_SOURCE_SQL = "SELECT id, description, courses, type, state, affiliation FROM colleges ORDER BY id"
+SIMILAR_STAGE_CREATE_SQL = (
+    "CREATE TEMP TABLE IF NOT EXISTS similar_stage "
+    "(college_id INT, rank SMALLINT, similar_id INT, score REAL) ON COMMIT DROP;"
+)
+SIMILAR_STAGE_COPY_SQL = "COPY similar_stage (college_id, rank, similar_id, score) FROM STDIN"
+SIMILAR_MERGE_SQL = """
+ANALYZE similar_stage;
+
+DELETE FROM college_similar s
+WHERE s.college_id BETWEEN %(lo)s AND %(hi)s
+  AND NOT EXISTS (
+    SELECT 1 FROM similar_stage t WHERE t.college_id = s.college_id AND t.rank = s.rank
+  );
+
+INSERT INTO college_similar (college_id, rank, similar_id, score)
+SELECT college_id, rank, similar_id, score FROM similar_stage
+ON CONFLICT (college_id, rank) DO UPDATE SET
+  similar_id = EXCLUDED.similar_id,
+  score      = EXCLUDED.score
+WHERE (college_similar.similar_id, college_similar.score)
+      IS DISTINCT FROM (EXCLUDED.similar_id, EXCLUDED.score);
+"""
+
+SIMILAR_LOOKUP_SQL = """
+SELECT c.id, c.name, c.city, c.state, c.type, c.rating, c.logo_url, s.score
+FROM college_similar s
+JOIN colleges c ON c.id = s.similar_id
+WHERE s.college_id = %s
+ORDER BY s.rank
+"""
+
+
+def similarity_features(description, courses, ctype, state, affiliation):
+    """Weighted feature → value map for one college (keys are prefixed by field)."""
+    feats = defaultdict(float)
+    words = defaultdict(int)
+    for word in search_terms(description):
+        if len(word) > 2 and word not in SEARCH_STOPWORDS:
+            words[word] += 1
+    for word, count in words.items():
+        feats["d:" + word] = SIMILAR_WEIGHTS["desc"] * (1.0 + math.log(count))
+    for label in courses or []:
+        feats["c:" + canonical_course(label)[0]] = SIMILAR_WEIGHTS["course"]
+    if ctype:
+        feats["t:" + ctype.lower()] = SIMILAR_WEIGHTS["type"]
+    if state:
+        feats["s:" + state.lower()] = SIMILAR_WEIGHTS["state"]
+    for token in split_affiliation(affiliation):
+        feats["a:" + token.strip().lower()] = SIMILAR_WEIGHTS["acc"]
+    return feats
+
+
+def _hashed(feats, dims):
+    for key, value in feats.items():
+        h = zlib.crc32(key.encode("utf-8"))
+        yield h % dims, -value if h >> 31 else value
+
+
+def similarity_matrix(docs, n=0, dims=SIMILAR_DIMS, block_bytes=SIMILAR_BLOCK_BYTES):
+    """
+    Rows of L2-normalised hashed TF-IDF vectors for an iterable of feature maps.
+    `n` is the expected row count: the array is allocated once at that size
+    (and grown in place if docs yields more), so nothing else scales with N.
+    """
+    X = np.zeros((max(n, 1), dims), dtype=np.float32)
+    count = 0
+    for feats in docs:
+        if count == X.shape[0]:
+            X.resize((count + max(1, count // 8), dims), refcheck=False)
+        row = defaultdict(float)
+        for j, value in _hashed(feats, dims):
+            row[j] += value
+        X[count, list(row)] = list(row.values())
+        count += 1
+    X.resize((count, dims), refcheck=False)
+
+    block = max(1, block_bytes // (4 * dims))
+    df = np.zeros(dims, dtype=np.int64)
+    for start in range(0, count, block):
+        df += np.count_nonzero(X[start:start + block], axis=0)
+    X *= (np.log((1.0 + count) / (1.0 + df)) + 1.0).astype(np.float32)
+    for start in range(0, count, block):
+        part = X[start:start + block]
+        norms = np.linalg.norm(part, axis=1, keepdims=True)
+        np.divide(part, norms, out=part, where=norms > 0)
+    return X
+
+
+def top_k_similar(X, k, block_bytes=SIMILAR_BLOCK_BYTES):
+    """Yield (first row, neighbour indexes, scores) per block, best first, self excluded."""
+    n = X.shape[0]
+    k = min(k, n - 1)
+    if k <= 0:
+        return
+    block = max(1, block_bytes // (4 * n))
+    for start in range(0, n, block):
+        scores = X[start:start + block] @ X.T
+        rows = np.arange(scores.shape[0])
+        scores[rows, start + rows] = -np.inf
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, part, axis=1)
+        order = np.argsort(-top, axis=1, kind="stable")
+        yield start, np.take_along_axis(part, order, axis=1), np.take_along_axis(top, order, axis=1)
+
+
+def build_similar(conn, k=SIMILAR_DEFAULT_K, itersize=10000, batch_size=None, after_batch=None):
+    """
+    Recompute college_similar for the whole catalog. By default the merge is
+    one statement pair and the caller commits; with `batch_size` it runs
+    `batch_size` colleges (an id range) per committed transaction, calling
+    `after_batch(conn, elapsed)` after each. Returns colleges scored.
+    """
+    if np is None:
+        print("❌  --similar needs NumPy. Run:  pip install numpy")
+        sys.exit(1)
+
+    with conn.cursor() as cur:
+        cur.execute(SIMILAR_COUNT_SQL)
+        expected = cur.fetchone()[0]
+
+    ids = []
+
+    def docs(cur):
+        for college_id, description, courses, ctype, state, affiliation in cur:
+            ids.append(college_id)
+            yield similarity_features(description, courses, ctype, state, affiliation)
+
+    with METRICS.phase("similar:matrix"), conn.cursor(name="seed_similar_scan") as cur:
+        cur.itersize = itersize
+        cur.execute(SIMILAR_SOURCE_SQL)
+        X = similarity_matrix(docs(cur), expected)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX, mode="w+", encoding="utf-8")
+    with METRICS.phase("similar:top_k"):
+        for start, neighbours, scores in top_k_similar(X, k):
+            for i, (row, row_scores) in enumerate(zip(neighbours.tolist(), scores.tolist())):
+                college_id = ids[start + i]
+                for rank, (j, score) in enumerate(zip(row, row_scores), 1):
+                    spool.write(f"{college_id}\t{rank}\t{ids[j]}\t{round(score, 4)}\n")
+    spool.seek(0)
+    # The spool is in id order, min(k, n - 1) lines per college.
+    per_college = max(0, min(k, len(ids) - 1))
+    per_batch = batch_size or max(len(ids), 1)
+    lo = SIMILAR_ID_RANGE[0]
+    for start in range(0, max(len(ids), 1), per_batch):
+        started = time.perf_counter()
+        end = start + per_batch
+        hi = SIMILAR_ID_RANGE[1] if end >= len(ids) else ids[end - 1]
+        buf = io.StringIO("".join(itertools.islice(spool, per_batch * per_college)))
+        with conn.cursor() as cur:
+            cur.execute(SIMILAR_STAGE_CREATE_SQL)
+            cur.copy_expert(SIMILAR_STAGE_COPY_SQL, buf)
+            cur.execute(SIMILAR_MERGE_SQL, {"lo": lo, "hi": hi})
+        if batch_size:
+            conn.commit()
+            if after_batch is not None:
+                after_batch(conn, time.perf_counter() - started)
+        lo = hi + 1
+    spool.close()
+    return len(ids)
+
+
+def similar_colleges(conn, college_id):
+    """Neighbours for the detail/compare pages — one primary-key range scan."""
+    with conn.cursor() as cur:
+        cur.execute(SIMILAR_LOOKUP_SQL, (college_id,))
+        return cur.fetchall()
+
+
+# ─── Facet counts + catalog version ────────────────────────────────────────────
+# college_facets is refreshed CONCURRENTLY, so readers keep seeing the previous
+# counts (no ACCESS EXCLUSIVE lock) until the new ones commit together with a
+# new catalog_versions row. Readers can cache facet responses keyed by version.
+#
+# Every committed transaction that changes colleges also gets its own version
+# (migration 22): the ids it touched are in college_changes, and the commit
+# sends NOTIFY catalog_changed '{"version": V, "changed": N}'. A cache that
+# last saw version L evicts exactly the ids from changes_since(conn, L); see
+# catalog_listener.py.
+CATALOG_CHANNEL = "catalog_changed"
+CATALOG_CHANGES_KEEP = 1000  # versions of college_changes kept for lagging caches
+FACETS_REFRESH_SQL = "REFRESH MATERIALIZED VIEW CONCURRENTLY college_facets"
+CATALOG_VERSION_SQL = "SELECT catalog_bump(%s)"
+CURRENT_VERSION_SQL = "SELECT coalesce(max(version), 0) FROM catalog_versions"
+# Facet refreshes are the versions stamped with rows_loaded; the commit trigger leaves it NULL.
+LAST_REFRESH_SQL = "SELECT coalesce(max(version), 0) FROM catalog_versions WHERE rows_loaded IS NOT NULL"
+PRUNE_CHANGES_SQL = """
+DELETE FROM college_changes c USING catalog_versions v
+WHERE v.xact_id = c.xact_id AND v.version <= %s
+"""
+CHANGED_SINCE_SQL = "SELECT coalesce(sum(changed), 0) FROM catalog_versions WHERE version > %s"
+# Like FACETS_SQL: the current version and the changes come from one snapshot.
+CHANGES_SINCE_SQL = """
+SELECT cur.version, v.version, c.college_id, c.deleted
+FROM (SELECT coalesce(max(version), 0) AS version FROM catalog_versions) cur
+LEFT JOIN (catalog_versions v JOIN college_changes c ON c.xact_id = v.xact_id)
+  ON v.version > %s
+ORDER BY v.version, c.college_id
+"""
+# One statement, one snapshot: the version always matches the counts returned.
+FACETS_SQL = """
+SELECT v.version, f.facet, f.value, f.colleges
+FROM (SELECT coalesce(max(version), 0) AS version FROM catalog_versions) v
+LEFT JOIN college_facets f ON true
+ORDER BY f.facet, f.colleges DESC, f.value
+"""
+
+
+def refresh_facets(conn, rows_loaded, force=False):
+    """
+    Refresh college_facets and record a new catalog version (caller commits).
+    Returns the version, or None when no college changed since the last
+    refresh: a no-op seed neither stamps a version nor NOTIFYs. `force` is for
+    the derived pass, whose writes change facet inputs without being logged.
+    """
+    with conn.cursor() as cur:
+        cur.execute(LAST_REFRESH_SQL)
+        if not force and changed_since(conn, cur.fetchone()[0]) == 0:
+            return None
+        cur.execute(FACETS_REFRESH_SQL)
+        cur.execute(CATALOG_VERSION_SQL, (rows_loaded,))
+        version = cur.fetchone()[0]
+        cur.execute(PRUNE_CHANGES_SQL, (version - CATALOG_CHANGES_KEEP,))
+        return version
+
+
+def catalog_version(conn):
+    with conn.cursor() as cur:
+        cur.execute(CURRENT_VERSION_SQL)
+        return cur.fetchone()[0]
+
+
+def changed_since(conn, version):
+    """Number of college changes committed after `version` (an id changed twice counts twice)."""
+    with conn.cursor() as cur:
+        cur.execute(CHANGED_SINCE_SQL, (version,))
+        return cur.fetchone()[0]
+
+
+def changes_since(conn, version):
+    """
+    Return (current version, {college_id: deleted}) for everything committed
+    after `version`. The dict is None when that history was already pruned:
+    the caller has to drop everything it cached.
+    """
+    changes = {}
+    with conn.cursor() as cur:
+        cur.execute(CHANGES_SINCE_SQL, (version,))
+        current = version
+        for current, _, college_id, deleted in cur:
+            if college_id is not None:
+                changes[college_id] = deleted
+    if version < current - CATALOG_CHANGES_KEEP:
+        return current, None
+    return current, changes
+
+
+def catalog_facets(conn):
+    """Return (catalog version, {facet: [(value, count), ...]})."""
+    version, facets = 0, defaultdict(list)
+    with conn.cursor() as cur:
+        cur.execute(FACETS_SQL)
+        for version, facet, value, count in cur:
+            if facet is not None:
+                facets[facet].append((value, count))
+    return version, dict(facets)
+
+
+# ─── Derived tables ────────────────────────────────────────────────────────────
+# college_courses, the accreditation/fee encoding and the geocodes are rebuilt
+# from colleges itself, not from the rows a run happened to stream: every
+# college changed after a stage's watermark (a catalog version) is read back
+# and pushed through the taps, one committed batch at a time, and the
+# watermark moves only after the last batch. Rows committed by an interrupted
+# run (and then skipped by --resume), or left behind by a crash between the
+# load and this step, are picked up by the next run. Without a watermark, or
+# with one older than the retained change history, every college is redone.
+# Courses + encodings and geocodes keep separate watermarks, so a missing
+# gazetteer holds back only the geocodes.
+#
+# The derived columns written back into colleges follow from columns whose
+# change was already logged, so these transactions SET LOCAL seed.derived and
+# record_college_changes() leaves them out of college_changes: no new catalog
+# version, and nothing for the next run to re-derive.
+DERIVED_WATERMARK = "derived"
+GEOCODE_WATERMARK = "geocode"
+DERIVED_BATCH = 5000
+DERIVED_UNLOGGED_SQL = "SET LOCAL seed.derived = 'on'"
+WATERMARK_GET_SQL = "SELECT version FROM seed_watermarks WHERE name = %s"
+WATERMARK_SET_SQL = """
+INSERT INTO seed_watermarks (name, version, updated_at) VALUES (%s, %s, NOW())
+ON CONFLICT (name) DO UPDATE SET version = EXCLUDED.version, updated_at = EXCLUDED.updated_at
+"""
+DERIVED_ALL_IDS_SQL = "SELECT id FROM colleges ORDER BY id"
+DERIVED_CHANGED_IDS_SQL = """
+SELECT DISTINCT ch.college_id
+FROM catalog_versions v
+JOIN college_changes ch ON ch.xact_id = v.xact_id
+JOIN colleges c ON c.id = ch.college_id
+WHERE v.version > %s AND v.version <= %s
+ORDER BY ch.college_id
+"""
+# Same column order as a to_db_row() tuple, so the taps read it unchanged.
+_DERIVED_COLS = ", ".join(f"{c}::text" if t == "JSONB" else c for c, t in STAGE_COLUMNS)
+DERIVED_ROWS_SQL = f"SELECT {_DERIVED_COLS} FROM colleges WHERE id = ANY(%s) ORDER BY id"
+
+
+def derived_pending(conn, watermark=DERIVED_WATERMARK):
+    """Return (ids to re-derive, catalog version they bring `watermark` to, full pass?)."""
+    with conn.cursor() as cur:
+        cur.execute(WATERMARK_GET_SQL, (watermark,))
+        row = cur.fetchone()
+        since = row[0] if row else None
+        cur.execute(CURRENT_VERSION_SQL)
+        upto = cur.fetchone()[0]
+        full = since is None or since < upto - CATALOG_CHANGES_KEEP
+        if full:
+            cur.execute(DERIVED_ALL_IDS_SQL)
+        else:
+            cur.execute(DERIVED_CHANGED_IDS_SQL, (since, upto))
+        ids = [college_id for (college_id,) in cur]
+    conn.commit()
+    return ids, upto, full
+
+
+def _derive(conn, ids, upto, watermark, step, batch_size, after_batch):
+    """Run step(conn, rows) over `ids` in committed, unlogged batches, then move `watermark` to `upto`."""
+    for start in range(0, len(ids), batch_size):
+        started = time.perf_counter()
+        with conn.cursor() as cur:
+            cur.execute(DERIVED_UNLOGGED_SQL)
+            cur.execute(DERIVED_ROWS_SQL, (ids[start:start + batch_size],))
+            rows = cur.fetchall()
+        step(conn, rows)
+        conn.commit()
+        print(f"    … {min(start + batch_size, len(ids)):,} of {len(ids):,} colleges", end="\r", flush=True)
+        if after_batch is not None:
+            after_batch(conn, time.perf_counter() - started)
+    if ids:
+        print()
+    with conn.cursor() as cur:
+        cur.execute(WATERMARK_SET_SQL, (watermark, upto))
+    conn.commit()
+    return len(ids)
+
+
+def refresh_derived(conn, ids, upto, batch_size=DERIVED_BATCH, after_batch=None):
+    """
+    Re-derive college_courses and the accreditation/fee encoding for `ids`,
+    committing each batch; `after_batch(conn, elapsed)` runs after every
+    commit. Moves the "derived" watermark to `upto` at the end. Returns
+    colleges processed.
+    """
+    def step(conn, rows):
+        courses, encodings = CourseTap(), EncodingTap()
+        for _ in encodings(courses(rows)):
+            pass
+        courses.apply(conn)
+        encodings.apply(conn)
+
+    return _derive(conn, ids, upto, DERIVED_WATERMARK, step, batch_size, after_batch)
+
+
+def refresh_geocodes(conn, ids, upto, gazetteer, batch_size=DERIVED_BATCH, after_batch=None):
+    """Geocode `ids` like refresh_derived(), under the "geocode" watermark. Returns the places that did not resolve."""
+    unresolved = []
+
+    def step(conn, rows):
+        places = GeoTap()
+        for _ in places(rows):
+            pass
+        unresolved.extend(places.apply(conn, gazetteer))
+
+    _derive(conn, ids, upto, GEOCODE_WATERMARK, step, batch_size, after_batch)
+    return unresolved
+
+
+# ─── Client-side search index (written by --export) ────────────────────────────
+# One JSON document the browser loads once:
+#   terms     sorted vocabulary — a query token matches every term it is a
+#             prefix of (binary search for the range [q, q + "\uffff"))
+#   postings  per term, delta-encoded (doc << 5 | field mask), doc = position
+#             in the list index (shard = doc // shard_size, row = doc % shard_size)
+#   trigrams  trigram → delta-encoded term numbers, for substring matches
+#             ("adras" → "madras") when no term starts with the token
+# Course and accreditation labels are also indexed run together
+# ("B.Tech" → "b", "tech", "btech") and names also by their initials
+# ("Indian Institute of Technology Madras" → "iitm", so "iit" finds it).
+# query_search_index() is the reference implementation the frontend mirrors.
+SEARCH_INDEX_FORMAT = 1
+SEARCH_FIELDS = ("name", "city", "state", "course", "accreditation")
+SEARCH_FIELD_WEIGHTS = (8, 4, 3, 2, 1)
+SEARCH_FIELD_BITS = len(SEARCH_FIELDS)
+SEARCH_TERM_RE = re.compile(r"[a-z0-9]+")
+SEARCH_STOPWORDS = frozenset(("of", "and", "the", "for", "in", "at"))
+
+
+def search_terms(text, compact=False):
+    if _blank(text):
+        return []
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii").lower()
+    terms = SEARCH_TERM_RE.findall(folded)
+    if compact and len(terms) > 1:
+        terms.append("".join(terms))
+    return terms
+
+
+def name_initials(name):
+    words = [w for w in search_terms(name) if w not in SEARCH_STOPWORDS]
+    return "".join(w[0] for w in words) if len(words) > 2 else None
+
+
+def trigrams(term):
+    return {term[i:i + 3] for i in range(len(term) - 2)}
+
+
+def _delta(values):
+    out, prev = [], 0
+    for v in values:
+        out.append(v - prev)
+        prev = v
+    return out
+
+
+def _undelta(deltas):
+    return list(itertools.accumulate(deltas))
+
+
+class SearchIndexBuilder:
+    """Accumulate postings for detail documents in list-index order; build() returns the JSON object."""
+
+    def __init__(self):
+        self.postings = defaultdict(dict)  # term → {doc: field mask}
+        self.docs = 0
+
+    def add(self, doc):
+        fields = (
+            [doc.get("name"), name_initials(doc.get("name"))], [doc.get("city")], [doc.get("state")],
+            doc.get("courses") or [], split_affiliation(doc.get("affiliation")),
+        )
+        for bit, (field, texts) in enumerate(zip(SEARCH_FIELDS, fields)):
+            compact = field in ("course", "accreditation")
+            for text in texts:
+                for term in search_terms(text, compact):
+                    docs = self.postings[term]
+                    docs[self.docs] = docs.get(self.docs, 0) | 1 << bit
+        self.docs += 1
+
+    def build(self):
+        terms = sorted(self.postings)
+        grams = defaultdict(list)
+        for n, term in enumerate(terms):
+            for gram in trigrams(term):
+                grams[gram].append(n)
+        return {
+            "format": SEARCH_INDEX_FORMAT,
+            "docs": self.docs,
+            "fields": SEARCH_FIELDS,
+            "weights": SEARCH_FIELD_WEIGHTS,
+            "terms": terms,
+            "postings": [
+                _delta(doc << SEARCH_FIELD_BITS | mask for doc, mask in sorted(self.postings[t].items()))
+                for t in terms
+            ],
+            "trigrams": {g: _delta(ns) for g, ns in sorted(grams.items())},
+        }
+
+
+def _matching_terms(index, token):
+    terms = index["terms"]
+    lo = bisect.bisect_left(terms, token)
+    hi = bisect.bisect_left(terms, token + "\uffff")
+    if lo < hi or len(token) < 3:
+        return range(lo, hi)
+    candidates = None
+    for gram in trigrams(token):
+        found = set(_undelta(index["trigrams"].get(gram, [])))
+        candidates = found if candidates is None else candidates & found
+    return sorted(n for n in candidates or () if token in terms[n])
+
+
+def query_search_index(index, text, limit=20):
+    """
+    Reference query over a build() result: every query token must match
+    (prefix, else substring); docs are ranked by summed field weights, with
+    exact term matches counting double. Returns [(doc, score), ...].
+    """
+    weights = index["weights"]
+    scores = None
+    for token in search_terms(text):
+        token_scores = {}
+        for n in _matching_terms(index, token):
+            exact = 2 if index["terms"][n] == token else 1
+            for entry in _undelta(index["postings"][n]):
+                doc, mask = entry >> SEARCH_FIELD_BITS, entry & ((1 << SEARCH_FIELD_BITS) - 1)
+                score = exact * sum(w for bit, w in enumerate(weights) if mask >> bit & 1)
+                token_scores[doc] = max(token_scores.get(doc, 0), score)
+        if scores is None:
+            scores = token_scores
+        else:
+            scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+        if not scores:
+            return []
+    ranked = sorted((scores or {}).items(), key=lambda item: (-item[1], item[0]))
+    return ranked[:limit]
+
+
+# ─── Static catalog snapshot (--export DIR) ────────────────────────────────────
+# Layout, everything but latest.json content-hashed and immutable (CDN:
+# Cache-Control: public, max-age=31536000, immutable; latest.json: short TTL):
+#   DIR/latest.json                       → {"version", "manifest": "v7/manifest.<hash>.json"}
+#   DIR/v7/manifest.<hash>.json           → shard list + INDEX_FIELDS
+#   DIR/v7/index-0000.<hash>.json         → {"fields": [...], "rows": [[...], ...]}
+#   DIR/v7/colleges/<id>.<hash>.json      → full detail document
+#   DIR/v7/search.<hash>.json             → client-side search index (see above)
+# Every file also gets .gz and (with `pip install brotli`) .br siblings.
+# The last index field is the detail document's hash, so the detail URL is
+# colleges/<id>.<detail>.json without a separate id → file map.
+EXPORT_SHARD_SIZE = 500
+EXPORT_HASH_BYTES = 8
+INDEX_FIELDS = ("id", "name", "city", "state", "type", "rating", "nirf_rank", "logo_url", "detail")
+DETAIL_FIELDS = (
+    "id", "name", "description", "city", "state", "country", "type", "established_year",
+    "rating", "is_featured", "website", "logo_url", "cover_image_url", "fee_structure",
+    "affiliation", "courses", "nirf_rank", "naac_grade", "fee_min_inr", "fee_max_inr", "fee_period",
+)
+EXPORT_SQL = "SELECT {} FROM colleges ORDER BY id".format(
+    ", ".join("rating::float8" if f == "rating" else f for f in DETAIL_FIELDS)
+)
+
+
+def _json_bytes(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class SnapshotWriter:
+    """Writes content-hashed JSON files plus pre-compressed variants under one directory."""
+
+    def __init__(self, root, brotli=None):
+        self.root = root
+        self.brotli = brotli
+        self.files = 0
+        self.raw_bytes = 0
+        self.gzip_bytes = 0
+        self.brotli_bytes = 0
+
+    def _put(self, path, data):
+        with open(path, "wb") as fh:
+            fh.write(data)
+        return len(data)
+
+    def write(self, stem, obj):
+        """Write obj as <stem>.<hash>.json (+ .gz/.br); returns (relative filename, hash)."""
+        data = _json_bytes(obj)
+        digest = hashlib.blake2b(data, digest_size=EXPORT_HASH_BYTES).hexdigest()
+        name = f"{stem}.{digest}.json"
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.raw_bytes += self._put(path, data)
+        self.gzip_bytes += self._put(path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if self.brotli is not None:
+            self.brotli_bytes += self._put(path + ".br", self.brotli.compress(data))
+        self.files += 1
+        return name, digest
+
+
+def export_snapshot(conn, out_dir, shard_size=EXPORT_SHARD_SIZE, itersize=10000):
+    """
+    Write a versioned static snapshot of colleges to out_dir from one
+    REPEATABLE READ snapshot. Returns (catalog version, colleges, SnapshotWriter).
+    """
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("    ⚠️   brotli not installed — writing gzip variants only (pip install brotli)")
+
+    conn.commit()
+    conn.set_session(isolation_level="REPEATABLE READ", readonly=True)
+    try:
+        version = catalog_version(conn)
+        version_dir = f"v{version}"
+        writer = SnapshotWriter(os.path.join(out_dir, version_dir), brotli)
+        shards, index_rows, total = [], [], 0
+        search = SearchIndexBuilder()
+
+        def flush_shard():
+            name, _ = writer.write(f"index-{len(shards):04d}", {"fields": INDEX_FIELDS, "rows": index_rows})
+            shards.append(name)
+
+        with conn.cursor(name="seed_export_scan") as cur:
+            cur.itersize = itersize
+            cur.execute(EXPORT_SQL)
+            for values in cur:
+                doc = dict(zip(DETAIL_FIELDS, values))
+                _, detail = writer.write(f"colleges/{doc['id']}", doc)
+                index_rows.append([doc[f] for f in INDEX_FIELDS[:-1]] + [detail])
+                search.add(doc)
+                total += 1
+                if len(index_rows) == shard_size:
+                    flush_shard()
+                    index_rows = []
+        if index_rows or not shards:
+            flush_shard()
+        conn.commit()
+    finally:
+        conn.set_session(isolation_level="DEFAULT", readonly="DEFAULT")
+
+    search_file, _ = writer.write("search", search.build())
+    manifest, _ = writer.write("manifest", {
+        "version": version,
+        "colleges": total,
+        "shard_size": shard_size,
+        "index_fields": INDEX_FIELDS,
+        "index": shards,
+        "detail": "colleges/{id}.{detail}.json",
+        "search": search_file,
+        "encodings": ["gzip"] + (["br"] if brotli is not None else []),
+    })
+    # latest.json is the one mutable file: replace it atomically, last.
+    tmp = os.path.join(out_dir, "latest.json.tmp")
+    with open(tmp, "wb") as fh:
+        fh.write(_json_bytes({"version": version, "manifest": f"{version_dir}/{manifest}"}))
+    os.replace(tmp, os.path.join(out_dir, "latest.json"))
+    return version, total, writer
+
+
+# ─── Post-load maintenance (--maintain) ────────────────────────────────────────
+# A bulk upsert leaves the planner with stale statistics and, for rewritten
+# rows, dead tuples. ANALYZE every touched table; VACUUM (ANALYZE) only those
+# whose dead share passes the threshold. Then pull the heap and the hot
+# indexes into shared_buffers with pg_prewarm so the first visitors after a
+# seed don't pay for cold reads. Runs in autocommit: VACUUM can't run inside
+# a transaction block.
+MAINTAIN_TABLES = (
+    "colleges", "course_dictionary", "college_courses",
+    "accreditation_tokens", "fee_schedules", "college_facets",
+)
+VACUUM_DEAD_RATIO = 0.1
+PREWARM_RELATIONS = (
+    "colleges", "colleges_pkey", "idx_colleges_name_unique", "idx_colleges_nirf_rank",
+    "idx_colleges_search_tsv", "idx_colleges_name_trgm",
+)
+DEAD_TUPLES_SQL = """
+SELECT coalesce(n_live_tup, 0), coalesce(n_dead_tup, 0)
+FROM pg_stat_user_tables WHERE relid = to_regclass(%s)
+"""
+PREWARM_EXTENSION_SQL = "CREATE EXTENSION IF NOT EXISTS pg_prewarm"
+PREWARM_SQL = "SELECT pg_prewarm(c.oid) FROM pg_class c WHERE c.oid = to_regclass(%s)"
+
+
+def dead_tuple_ratio(cur, table):
+    cur.execute(DEAD_TUPLES_SQL, (table,))
+    live, dead = cur.fetchone() or (0, 0)
+    return dead / (live + dead) if live + dead else 0.0
+
+
+def _timed(cur, step, sql, params=None):
+    started = time.perf_counter()
+    with METRICS.phase(f"maintain:{step}"):
+        cur.execute(sql, params)
+    return time.perf_counter() - started
+
+
+def maintain(conn, tables=MAINTAIN_TABLES, dead_ratio=VACUUM_DEAD_RATIO, prewarm=PREWARM_RELATIONS, between=None):
+    """
+    ANALYZE/VACUUM `tables` and prewarm `prewarm`; `between(conn)` runs
+    before each table. Returns [(step, relation, seconds, detail)].
+    """
+    steps = []
+    conn.commit()
+    session = pooler_mode() == "session"
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            if session:
+                cur.execute("SET statement_timeout = 0")
+            for table in tables:
+                if between is not None:
+                    between(conn)
+                cur.execute("SELECT to_regclass(%s)", (table,))
+                if cur.fetchone()[0] is None:
+                    continue
+                ratio = dead_tuple_ratio(cur, table)
+                step = "vacuum" if ratio >= dead_ratio else "analyze"
+                sql = f"VACUUM (ANALYZE) {table}" if step == "vacuum" else f"ANALYZE {table}"
+                steps.append((step, table, _timed(cur, step, sql), f"{ratio:.1%} dead"))
+
+            try:
+                cur.execute(PREWARM_EXTENSION_SQL)
+            except psycopg2.Error as e:
+                steps.append(("prewarm", "-", 0.0, f"skipped: {str(e).strip().splitlines()[0]}"))
+                prewarm = ()
+            for relation in prewarm:
+                seconds = _timed(cur, "prewarm", PREWARM_SQL, (relation,))
+                row = cur.fetchone()
+                if row is not None:
+                    METRICS.add("prewarm_blocks", row[0])
+                    steps.append(("prewarm", relation, seconds, f"{row[0]:,} blocks"))
+            if session:
+                cur.execute("RESET statement_timeout")
+    finally:
+        conn.autocommit = False
+    return steps
+
+
+# ─── Loader engines ────────────────────────────────────────────────────────────
+# Per transaction an engine sees: begin(cur) → write(cur, chunk)* → flush(cur).
+
+class ValuesEngine:
+    """Multi-row INSERT ... VALUES upsert via execute_values, one statement per chunk."""
+    name = "values"
+
+    def __init__(self, force=False):
+        self.sql = INSERT_FORCE_SQL if force else INSERT_SQL
+
+    def begin(self, cur):
+        pass
+
+    def write(self, cur, chunk):
+        chunk = ordered_batch(chunk)
+        execute_values(cur, self.sql, chunk, page_size=len(chunk))
+        METRICS.add("bytes_sent", len(cur.query or b""))
+
+    def flush(self, cur):
+        pass
+
+
+class CopyEngine:
+    """COPY chunks into a temp staging table, then merge once per transaction."""
+    name = "copy"
+
+    def __init__(self, force=False):
+        self.merge_sql = STAGE_MERGE_FORCE_SQL if force else STAGE_MERGE_SQL
+
+    def begin(self, cur):
+        cur.execute(STAGE_CREATE_SQL)
+
+    def write(self, cur, chunk):
+        buf = copy_buffer(chunk)
+        cur.copy_expert(STAGE_COPY_SQL, buf)
+        METRICS.add("bytes_sent", len(buf.getvalue().encode("utf-8")))
+
+    def flush(self, cur):
+        cur.execute(self.merge_sql)
+        cur.execute(STAGE_TRUNCATE_SQL)
+
+
+ENGINES = {e.name: e for e in (ValuesEngine, CopyEngine)}
+
+
+def load_chunks(conn, chunks, engine, progress=False):
+    """Push chunks through one engine transaction on `conn` (caller commits). Returns rows sent."""
+    cur = conn.cursor()
+    total = 0
+    engine.begin(cur)
+    chunks = iter(chunks)
+    while True:
+        with METRICS.phase("build"):  # parse + transform + filter, pulled lazily
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with METRICS.phase("send"):
+            engine.write(cur, chunk)
+        METRICS.add("rows", len(chunk))
+        total += len(chunk)
+        if progress:
+            print(f"    … {total:,} rows sent", end="\r", flush=True)
+    if progress:
+        print()
+    with METRICS.phase("flush"):
+        engine.flush(cur)
+    cur.close()
+    return total
+
+
+# ─── Parallel sharded loading (--workers) ──────────────────────────────────────
+# Rows are routed by crc32(name) so each unique-index key belongs to exactly one
+# shard; shards never wait on each other's row locks. One producer parses the
+# source and feeds bounded per-shard queues, so memory stays at roughly
+# workers × SHARD_QUEUE_DEPTH chunks. Each shard commits on its own connection.
+SHARD_QUEUE_DEPTH = 4
+SCALING_WORKERS = (1, 2, 4, 8)
+
+_ABORT = object()
+
+
+def shard_of(name, shards):
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+
+class ShardResult:
+    def __init__(self, shard):
+        self.shard = shard
+        self.rows = 0
+        self.seconds = 0.0
+        self.error = None
+        self.drained = False
+
+
+def _queue_chunks(q, result):
+    while True:
+        item = q.get()
+        if item is None:
+            result.drained = True
+            return
+        if item is _ABORT:
+            result.drained = True
+            raise RuntimeError("aborted: source stream failed")
+        yield item
+
+
+def _shard_worker(q, make_engine, result):
+    started = time.perf_counter()
+    db = get_pool()
+    conn = None
+    broken = False
+    try:
+        conn = db.getconn()
+        result.rows = load_chunks(conn, _queue_chunks(q, result), make_engine())
+        conn.commit()
+    except Exception as e:
+        result.error = e
+        broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+        # Keep consuming so the producer never blocks on a dead shard.
+        while not result.drained:
+            if q.get() in (None, _ABORT):
+                result.drained = True
+    finally:
+        result.seconds = time.perf_counter() - started
+        if conn is not None:
+            db.putconn(conn, close=broken)  # rolls back anything uncommitted
+
+
+def load_parallel(rows, workers, make_engine, chunk_size):
+    """Load `rows` over `workers` connections, one shard each. Returns per-shard results."""
+    queues = [queue.Queue(maxsize=SHARD_QUEUE_DEPTH) for _ in range(workers)]
+    results = [ShardResult(i) for i in range(workers)]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="seed-shard") as pool:
+        for q, result in zip(queues, results):
+            pool.submit(_shard_worker, q, make_engine, result)
+
+        buffers = [[] for _ in range(workers)]
+        end = _ABORT
+        try:
+            for row in rows:
+                i = shard_of(row[0], workers)
+                buffers[i].append(row)
+                if len(buffers[i]) >= chunk_size:
+                    queues[i].put(buffers[i])
+                    buffers[i] = []
+            for q, buf in zip(queues, buffers):
+                if buf:
+                    q.put(buf)
+            end = None
+        finally:
+            for q in queues:
+                q.put(end)
+    return results
+
+
+def print_shard_report(results, elapsed):
+    print(f"    {'shard':>5}  {'rows':>10}  {'seconds':>8}  {'rows/sec':>10}  status")
+    for r in results:
+        rate = r.rows / r.seconds if r.seconds > 0 else 0.0
+        status = f"❌ {r.error}" if r.error else "✅"
+        print(f"    {r.shard:>5}  {r.rows:>10,}  {r.seconds:>8.2f}  {rate:>10,.0f}  {status}")
+    total = sum(r.rows for r in results)
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"    {'all':>5}  {total:>10,}  {elapsed:>8.2f}  {rate:>10,.0f}")
+
+
+def run_scaling_report(source, engine_name, chunk_size):
+    """
+    Load the same source at 1, 2, 4 and 8 workers and print throughput.
+    A warm-up run makes sure every row exists; measured runs then use the
+    unguarded upsert so each one rewrites the same rows and is comparable.
+    Point this at a scratch database, not production.
+    """
+    print("\n🔥  Warm-up load...")
+    load_parallel(map(to_db_row, source()), max(SCALING_WORKERS),
+                  lambda: ENGINES[engine_name](), chunk_size)
+
+    print(f"\n📊  Scaling report (engine: {engine_name}, chunk size: {chunk_size})")
+    print(f"    {'workers':>7}  {'rows':>10}  {'seconds':>8}  {'rows/sec':>10}  {'speedup':>7}")
+    baseline = None
+    for workers in SCALING_WORKERS:
+        started = time.perf_counter()
+        results = load_parallel(map(to_db_row, source()), workers,
+                                lambda: ENGINES[engine_name](force=True), chunk_size)
+        elapsed = time.perf_counter() - started
+        failed = [r for r in results if r.error]
+        total = sum(r.rows for r in results)
+        rate = total / elapsed if elapsed > 0 else 0.0
+        baseline = baseline or rate
+        speedup = rate / baseline if baseline else 0.0
+        note = f"  ❌ {len(failed)} shard(s) failed" if failed else ""
+        print(f"    {workers:>7}  {total:>10,}  {elapsed:>8.2f}  {rate:>10,.0f}  {speedup:>6.2f}x{note}")
+
+
+# ─── Async pipelined loader (engine "async") ───────────────────────────────────
+# Over a high-latency link (Render → Supabase) execute_values spends most of its
+# time waiting one round trip per batch. This backend uses psycopg 3's libpq
+# pipeline mode: batches are sent back to back without waiting for results and
+# the client only blocks at a sync point every --inflight batches, so
+# throughput is bounded by bandwidth rather than RTT. Each batch is one
+# INSERT ... SELECT FROM unnest(column arrays) with the same ON CONFLICT clause
+# as INSERT_SQL; the statement text is fixed, one parameter per column.
+DEFAULT_INFLIGHT = 8
+
+_UNNEST_ARGS = ", ".join(
+    f"%s::{'text' if t == 'JSONB' else t.lower()}[]" for _, t in STAGE_COLUMNS
+)
+_UNNEST_SELECT = ", ".join(f"{c}::jsonb" if t == "JSONB" else c for c, t in STAGE_COLUMNS)
+
+_UNNEST_INSERT_SQL = f"""
+INSERT INTO colleges ({_STAGE_COLS})
+SELECT {_UNNEST_SELECT}
+FROM unnest({_UNNEST_ARGS}) AS t({_STAGE_COLS})
+"""
+
+UNNEST_INSERT_SQL = _UNNEST_INSERT_SQL + ON_CONFLICT_SQL + HASH_GUARD_SQL
+UNNEST_INSERT_FORCE_SQL = _UNNEST_INSERT_SQL + ON_CONFLICT_SQL
+
+
+def _columns(chunk):
+    return [list(col) for col in zip(*chunk)]
+
+
+async def _load_async(rows, chunk_size, inflight, force):
+    try:
+        import psycopg
+    except ImportError:
+        print("❌  --engine async needs psycopg 3. Run:  pip install 'psycopg[binary]'")
+        sys.exit(1)
+
+    params, mode, settings = connection_params()
+    conn = await psycopg.AsyncConnection.connect(
+        # Server-side prepared statements don't survive transaction pooling.
+        prepare_threshold=None if mode == "transaction" else 5,
+        **params,
+    )
+    sql = UNNEST_INSERT_FORCE_SQL if force else UNNEST_INSERT_SQL
+    total = 0
+    async with conn:
+        async with conn.transaction():
+            async with conn.pipeline() as pipeline, conn.cursor() as cur:
+                for name, value in settings.items() if mode == "transaction" else ():
+                    await cur.execute("SELECT set_config(%s, %s, true)", (name, value))
+                pending = 0
+                for chunk in chunked(rows, chunk_size):
+                    await cur.execute(sql, _columns(ordered_batch(chunk)))
+                    METRICS.add("rows", len(chunk))
+                    total += len(chunk)
+                    pending += 1
+                    if pending >= inflight:
+                        await pipeline.sync()
+                        pending = 0
+                        print(f"    … {total:,} rows acknowledged", end="\r", flush=True)
+    print()
+    return total
+
+
+def load_async(rows, chunk_size, inflight=DEFAULT_INFLIGHT, force=False):
+    """Load `rows` over one pipelined psycopg 3 connection and commit. Returns rows sent."""
+    return asyncio.run(_load_async(rows, chunk_size, inflight, force))
+
+
+# ─── Checkpointed loading (--commit-every / --resume) ──────────────────────────
+# Each transaction carries up to --commit-every rows plus an update of the job's
+# row in seed_progress, so progress is committed atomically with the data it
+# describes. A transaction that fails with a transient error is rolled back and
+# replayed on a fresh connection; nothing in it was committed, so nothing is
+# applied twice. rows_done counts *source* records consumed, which keeps resume
+# correct even when --incremental or --sync filter rows out.
+PROGRESS_GET_SQL = "SELECT rows_done FROM seed_progress WHERE job_id = %s"
+
+PROGRESS_SET_SQL = """
+INSERT INTO seed_progress (job_id, rows_done, updated_at) VALUES (%s, %s, NOW())
+ON CONFLICT (job_id) DO UPDATE SET rows_done = EXCLUDED.rows_done, updated_at = NOW()
+"""
+
+PROGRESS_CLEAR_SQL = "DELETE FROM seed_progress WHERE job_id = %s"
+
+TRANSIENT_ERRORS = (
+    psycopg2.OperationalError,
+    psycopg2.InterfaceError,
+    psycopg2.extensions.TransactionRollbackError,  # serialization failure / deadlock
+)
+
+MAX_RETRIES = 5
+
+
+def default_job_id(spec):
+    """Identify a load by its source: same file, size and mtime → same job."""
+    if spec in (None, "builtin") or spec.startswith("synthetic:"):
+        return spec or "builtin"
+    st = os.stat(spec)
+    key = f"{os.path.abspath(spec)}:{st.st_size}:{st.st_mtime_ns}"
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+    return f"{os.path.basename(spec)}:{digest}"
+
+
+def read_progress(conn, job_id):
+    with conn.cursor() as cur:
+        cur.execute(PROGRESS_GET_SQL, (job_id,))
+        row = cur.fetchone()
+    return row[0] if row else 0
+
+
+class CountingIterator:
+    """Pass items through while counting how many have been pulled."""
+
+    def __init__(self, iterable):
+        self._it = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self._it)
+        self.count += 1
+        return item
+
+
+class CheckpointedLoad:
+    def __init__(self, conn, job_id, make_engine, chunk_size, commit_every, max_retries=MAX_RETRIES,
+                 after_batch=None):
+        self.conn = conn
+        self.job_id = job_id
+        self.make_engine = make_engine
+        self.chunk_size = chunk_size
+        self.commit_every = commit_every
+        self.max_retries = max_retries
+        self.after_batch = after_batch  # after_batch(conn, seconds) runs between committed batches
+        self.retries = 0
+
+    def _transaction(self, work):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if self.conn is None or self.conn.closed:
+                    self.conn = get_connection()
+                    self.conn.autocommit = False
+                work(self.conn)
+                with METRICS.phase("commit"):
+                    self.conn.commit()
+                return
+            except TRANSIENT_ERRORS as e:
+                # The reconnect itself may be what failed, leaving no connection to close.
+                if self.conn is not None:
+                    try:
+                        self.conn.close()
+                    except psycopg2.Error:
+                        pass
+                self.conn = None
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                METRICS.add("retries")
+                delay = backoff_delay(attempt)
+                print(f"\n    ⚠️   {type(e).__name__}: {str(e).strip()} — retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+
+    def run(self, rows, feed, base, finish=None):
+        """
+        Load `rows` in committed batches. `feed` is the CountingIterator (or
+        Validator) over the raw source that `rows` is derived from; `base` is
+        the number of source records skipped on resume. `finish(cur)` runs in
+        the final transaction.
+        """
+        total = 0
+        for batch in chunked(rows, self.commit_every):
+            position = base + feed.count
+
+            def work(conn, batch=batch, position=position):
+                load_chunks(conn, chunked(batch, self.chunk_size), self.make_engine())
+                with conn.cursor() as cur:
+                    cur.execute(PROGRESS_SET_SQL, (self.job_id, position))
+
+            started = time.perf_counter()
+            self._transaction(work)
+            total += len(batch)
+            print(f"    … {total:,} rows committed (source position {position:,})", end="\r", flush=True)
+            if self.after_batch is not None:
+                self.after_batch(self.conn, time.perf_counter() - started)
+        print()
+
+        def done(conn):
+            with conn.cursor() as cur:
+                if finish is not None:
+                    finish(cur)
+                cur.execute(PROGRESS_CLEAR_SQL, (self.job_id,))
+
+        self._transaction(done)
+        return total
+
+
+# ─── Online mode (--online) ────────────────────────────────────────────────────
+# For seeding the live database during traffic: small committed batches
+# (CheckpointedLoad), short lock/statement timeouts so a blocked batch fails
+# fast and is retried instead of queueing readers behind it, name-ordered
+# batches (ordered_batch), and a Throttle between batches. A deploy lock stops
+# a second seed from starting: a session advisory lock on a direct/session
+# connection, a renewed lease row in seed_leases behind a transaction pooler
+# (session locks would stay with whichever backend the pooler picked).
+ONLINE_BATCH = 200
+ONLINE_LOCK_TIMEOUT = "2s"
+ONLINE_STATEMENT_TIMEOUT = "30s"
+ONLINE_TARGET_MS = 250
+ONLINE_MAX_LAG = 10.0      # seconds of replica replay lag
+ONLINE_DUTY_CYCLE = 0.5    # share of wall time spent writing when healthy
+THROTTLE_MIN_BACKOFF = 0.05
+THROTTLE_MAX_PAUSE = 30.0
+
+DEPLOY_LOCK_NAME = "zpluse-seed:load"
+LEASE_TTL = 120  # seconds; renewed after every batch
+ADVISORY_LOCK_SQL = "SELECT pg_try_advisory_lock(hashtext(%s))"
+ADVISORY_UNLOCK_SQL = "SELECT pg_advisory_unlock(hashtext(%s))"
+LEASE_ACQUIRE_SQL = """
+INSERT INTO seed_leases (name, holder, expires_at) VALUES (%(name)s, %(holder)s, NOW() + %(ttl)s * INTERVAL '1 second')
+ON CONFLICT (name) DO UPDATE SET holder = EXCLUDED.holder, expires_at = EXCLUDED.expires_at
+WHERE seed_leases.holder = EXCLUDED.holder OR seed_leases.expires_at < NOW()
+RETURNING holder
+"""
+LEASE_RELEASE_SQL = "DELETE FROM seed_leases WHERE name = %s AND holder = %s"
+LEASE_HOLDER_SQL = "SELECT holder, expires_at FROM seed_leases WHERE name = %s"
+REPLICA_LAG_SQL = "SELECT count(*), extract(epoch FROM max(replay_lag)) FROM pg_stat_replication"
+
+
+class DeployLockError(Exception):
+    pass
+
+
+class DeployLock:
+    """One seed at a time across deploys; acquire() raises DeployLockError if another holds it."""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.holder = f"{os.uname().nodename}:{os.getpid()}:{os.urandom(4).hex()}"
+        self.conn = None
+
+    def acquire(self, conn):
+        with conn.cursor() as cur:
+            if self.mode == "session":
+                cur.execute(ADVISORY_LOCK_SQL, (DEPLOY_LOCK_NAME,))
+                ok = cur.fetchone()[0]
+                other = "another session"
+            else:
+                cur.execute(LEASE_ACQUIRE_SQL, {"name": DEPLOY_LOCK_NAME, "holder": self.holder, "ttl": LEASE_TTL})
+                ok = cur.fetchone() is not None
+                other = None
+                if not ok:
+                    cur.execute(LEASE_HOLDER_SQL, (DEPLOY_LOCK_NAME,))
+                    row = cur.fetchone()
+                    other = "{} until {}".format(*row) if row else "lease just changed hands"
+        conn.commit()
+        if not ok:
+            raise DeployLockError(f"another seed is running ({other})")
+        self.conn = conn
+
+    def renew(self, conn):
+        """Extend the lease; re-take a session lock lost with a replaced connection."""
+        if self.mode != "session" or conn is not self.conn:
+            self.acquire(conn)
+
+    def release(self, conn):
+        with conn.cursor() as cur:
+            if self.mode == "session":
+                cur.execute(ADVISORY_UNLOCK_SQL, (DEPLOY_LOCK_NAME,))
+            else:
+                cur.execute(LEASE_RELEASE_SQL, (DEPLOY_LOCK_NAME, self.holder))
+        conn.commit()
+
+
+class Throttle:
+    """
+    Pause after each committed batch. The base pause holds the seed to
+    `duty` of wall time (at 0.5, a 120ms batch is followed by 120ms idle).
+    A batch slower than target_ms, or replica lag above max_lag, doubles an
+    extra back-off (up to THROTTLE_MAX_PAUSE); each healthy batch halves it.
+    Lag is read from pg_stat_replication when the role may see it.
+    """
+
+    def __init__(self, target_ms=ONLINE_TARGET_MS, max_lag=ONLINE_MAX_LAG, duty=ONLINE_DUTY_CYCLE):
+        self.target = target_ms / 1000.0
+        self.max_lag = max_lag
+        self.duty = duty
+        self.backoff = 0.0
+        self.lag_available = True
+        self.slow_batches = 0
+        self.slept = 0.0
+
+    def replica_lag(self, conn):
+        if not self.lag_available:
+            return None
+        try:
+            with conn.cursor() as cur:
+                cur.execute(REPLICA_LAG_SQL)
+                replicas, lag = cur.fetchone()
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            self.lag_available = False
+            return None
+        if not replicas:
+            return None
+        return float(lag or 0.0)
+
+    def pause_for(self, elapsed, lag):
+        slow = elapsed > self.target or (lag is not None and lag > self.max_lag)
+        if slow:
+            self.slow_batches += 1
+            self.backoff = min(THROTTLE_MAX_PAUSE, max(THROTTLE_MIN_BACKOFF, self.backoff * 2))
+        else:
+            self.backoff = self.backoff / 2 if self.backoff >= 2 * THROTTLE_MIN_BACKOFF else 0.0
+        return min(THROTTLE_MAX_PAUSE, elapsed * (1 - self.duty) / self.duty + self.backoff)
+
+    def __call__(self, conn, elapsed):
+        pause = self.pause_for(elapsed, self.replica_lag(conn))
+        METRICS.add("throttle_seconds", pause)
+        self.slept += pause
+        time.sleep(pause)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the colleges table.")
+    parser.add_argument(
+        "--source", default=None,
+        help="CSV or JSONL file (optionally .gz) to load instead of the built-in COLLEGES list",
+    )
+    parser.add_argument(
+        "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+        help=f"rows parsed and sent per batch (default {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--engine", choices=sorted(ENGINES) + ["async"], default="values",
+        help="values = execute_values upsert (default); copy = COPY into staging + one merge; "
+             "async = pipelined psycopg 3 batches",
+    )
+    parser.add_argument(
+        "--inflight", type=int, default=DEFAULT_INFLIGHT,
+        help=f"with --engine async, batches sent before waiting for results (default {DEFAULT_INFLIGHT})",
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="fetch existing content hashes first and send only new or changed rows",
+    )
+    parser.add_argument(
+        "--sync", action="store_true",
+        help="reconcile colleges with the source: insert, update AND delete rows not in the source",
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="with --sync, print the reconciliation plan and roll back without writing",
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="rewrite every row even when its content hash is unchanged",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1,
+        help="load over N connections, sharding rows by hash(name) (default 1)",
+    )
+    parser.add_argument(
+        "--scaling-report", action="store_true",
+        help=f"benchmark --workers {', '.join(map(str, SCALING_WORKERS))} on the source (scratch DB only)",
+    )
+    parser.add_argument(
+        "--dedupe", choices=("report", "skip"), default=None,
+        help="find exact and near-duplicate colleges in the source and the DB first; "
+             "report = print the merge report only, skip = also load only each cluster's survivor",
+    )
+    parser.add_argument(
+        "--dedupe-threshold", type=float, default=DEDUPE_THRESHOLD, metavar="SCORE",
+        help=f"name similarity (0-1) at which two colleges are merged (default {DEDUPE_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--dedupe-report", default=None, metavar="PATH",
+        help="also write the merge report as JSON",
+    )
+    parser.add_argument(
+        "--gazetteer", default=GAZETTEER_PATH, metavar="PATH",
+        help="city,state,latitude,longitude,aliases CSV for offline geocoding (default: bundled india_gazetteer.csv)",
+    )
+    parser.add_argument(
+        "--similar", nargs="?", type=int, const=SIMILAR_DEFAULT_K, default=0, metavar="K",
+        help=f"after seeding, recompute each college's top-K similar colleges (default K={SIMILAR_DEFAULT_K}; needs numpy)",
+    )
+    parser.add_argument(
+        "--export", default=None, metavar="DIR",
+        help="after seeding, write a versioned static catalog snapshot (sharded JSON + gzip/brotli) to DIR",
+    )
+    parser.add_argument(
+        "--export-only", action="store_true",
+        help="with --export, skip loading and export the catalog as it is in the database",
+    )
+    parser.add_argument(
+        "--export-shard-size", type=int, default=EXPORT_SHARD_SIZE, metavar="N",
+        help=f"colleges per list-index shard in the snapshot (default {EXPORT_SHARD_SIZE})",
+    )
+    parser.add_argument(
+        "--maintain", action="store_true",
+        help="after seeding, ANALYZE the touched tables, VACUUM those past --vacuum-threshold, "
+             "and prewarm the heap and hot indexes (pg_prewarm)",
+    )
+    parser.add_argument(
+        "--vacuum-threshold", type=float, default=VACUUM_DEAD_RATIO, metavar="RATIO",
+        help=f"with --maintain, VACUUM a table once this share of its tuples is dead (default {VACUUM_DEAD_RATIO:g})",
+    )
+    parser.add_argument(
+        "--post-load-only", action="store_true",
+        help="skip loading and run only the post-load steps (derived tables, facet counts, and "
+             "--similar/--maintain/--export if given), e.g. off-peak after an --online seed",
+    )
+    parser.add_argument(
+        "--rejects", default=DEFAULT_REJECTS, metavar="PATH",
+        help=f"invalid source records are skipped and written here with reasons as JSONL (default {DEFAULT_REJECTS})",
+    )
+    parser.add_argument(
+        "--commit-every", type=int, default=0, metavar="N",
+        help="commit every N rows and record progress in seed_progress (default: one transaction)",
+    )
+    parser.add_argument(
+        "--resume", action="store_true",
+        help="with --commit-every, skip source records already committed by an interrupted run",
+    )
+    parser.add_argument(
+        "--job-id", default=None,
+        help="progress key for --resume (default: derived from the source path, size and mtime)",
+    )
+    parser.add_argument(
+        "--max-retries", type=int, default=MAX_RETRIES,
+        help=f"retries per batch on transient connection errors (default {MAX_RETRIES})",
+    )
+    parser.add_argument(
+        "--online", action="store_true",
+        help=f"seed a live database gently: batches of --commit-every (default {ONLINE_BATCH}) rows, "
+             f"lock_timeout {ONLINE_LOCK_TIMEOUT} / statement_timeout {ONLINE_STATEMENT_TIMEOUT} unless set, "
+             "adaptive pauses, and a lock against concurrent seeds",
+    )
+    parser.add_argument(
+        "--target-batch-ms", type=int, default=ONLINE_TARGET_MS, metavar="MS",
+        help=f"with --online, back off when a batch takes longer than this (default {ONLINE_TARGET_MS})",
+    )
+    parser.add_argument(
+        "--max-replica-lag", type=float, default=ONLINE_MAX_LAG, metavar="SECONDS",
+        help=f"with --online, back off while replica replay lag exceeds this (default {ONLINE_MAX_LAG:g})",
+    )
+    parser.add_argument(
+        "--pooler-mode", choices=("auto", "transaction", "session"), default=None,
+        help="transaction = PgBouncer/Supavisor transaction pooling (no session state); "
+             "default auto-detects from the URL",
+    )
+    parser.add_argument(
+        "--statement-timeout", default=None, metavar="DURATION",
+        help="per-transaction statement_timeout, e.g. 5min (env SEED_STATEMENT_TIMEOUT)",
+    )
+    parser.add_argument(
+        "--lock-timeout", default=None, metavar="DURATION",
+        help="per-transaction lock_timeout, e.g. 10s (env SEED_LOCK_TIMEOUT)",
+    )
+    parser.add_argument(
+        "--connect-retries", type=int, default=None,
+        help=f"connection attempts retried with jittered backoff (default {CONNECT_RETRIES})",
+    )
+    parser.add_argument(
+        "--metrics", choices=("jsonl", "openmetrics"), default=None,
+        help="emit per-phase timings, counters and server stats at the end of the run",
+    )
+    parser.add_argument(
+        "--metrics-out", default="-", metavar="PATH",
+        help="where --metrics goes (default: stdout)",
+    )
+    parser.add_argument(
+        "--profile", nargs="?", const="seed_colleges.pstats", default=None, metavar="PATH",
+        help="run under cProfile and write stats to PATH (default seed_colleges.pstats)",
+    )
+    args = parser.parse_args(argv)
+    if args.online:
+        if args.workers > 1 or args.engine == "async" or args.scaling_report:
+            parser.error("--online loads in small batches on one connection; "
+                         "drop --workers/--engine async/--scaling-report")
+        args.commit_every = args.commit_every or ONLINE_BATCH
+        args.chunk_size = min(args.chunk_size, args.commit_every)
+        args.lock_timeout = args.lock_timeout or DB_SETTINGS["lock_timeout"] or ONLINE_LOCK_TIMEOUT
+        args.statement_timeout = (args.statement_timeout or DB_SETTINGS["statement_timeout"]
+                                  or ONLINE_STATEMENT_TIMEOUT)
+    if args.workers < 1:
+        parser.error("--workers must be >= 1")
+    if args.dry_run and not args.sync:
+        parser.error("--dry-run requires --sync")
+    if args.sync and args.incremental:
+        parser.error("--sync already sends only changed rows; drop --incremental")
+    if args.resume and not args.commit_every:
+        parser.error("--resume requires --commit-every")
+    if args.commit_every and args.workers > 1:
+        parser.error("--commit-every/--resume run on a single connection; drop --workers")
+    if args.engine == "async" and (args.workers > 1 or args.commit_every or args.scaling_report):
+        parser.error("--engine async runs one pipelined connection; drop --workers/--commit-every/--scaling-report")
+    if args.scaling_report and (args.sync or args.incremental):
+        parser.error("--scaling-report loads the full source; drop --sync/--incremental")
+    if args.export_only and not args.export:
+        parser.error("--export-only requires --export DIR")
+    if args.post_load_only and (args.export_only or args.scaling_report or args.sync or args.incremental
+                                or args.dedupe or args.resume):
+        parser.error("--post-load-only loads nothing; drop --export-only/--scaling-report/--sync/"
+                     "--incremental/--dedupe/--resume")
+    if args.export and args.scaling_report:
+        parser.error("--scaling-report writes to a scratch DB; drop --export")
+    if args.export_shard_size < 1:
+        parser.error("--export-shard-size must be >= 1")
+    if args.similar < 0:
+        parser.error("--similar K must be >= 0")
+    if not 0.0 <= args.vacuum_threshold <= 1.0:
+        parser.error("--vacuum-threshold must be in [0, 1]")
+    if args.dedupe_report and not args.dedupe:
+        parser.error("--dedupe-report requires --dedupe")
+    if args.dedupe == "skip" and args.sync:
+        parser.error("--dedupe skip would let --sync delete the surviving DB rows; use --dedupe report")
+    if not 0.0 < args.dedupe_threshold <= 1.0:
+        parser.error("--dedupe-threshold must be in (0, 1]")
+    return args
+
+
+def run(args):
+    configure_connections(
+        pooler_mode=args.pooler_mode,
+        statement_timeout=args.statement_timeout,
+        lock_timeout=args.lock_timeout,
+        connect_retries=args.connect_retries,
+        pool_size=max(args.workers, max(SCALING_WORKERS) if args.scaling_report else 1),
+    )
+    try:
+        source = make_source(args.source)
+    except (ValueError, FileNotFoundError) as e:
+        print(f"❌  Bad --source: {e}")
+        sys.exit(1)
+
+    print("=" * 60)
+    print("  Zpluse University — College Seed Script")
+    if source is builtin_source:
+        print(f"  Total colleges to insert/update: {len(COLLEGES)}")
+    else:
+        print(f"  Streaming colleges from: {args.source}")
+    print("=" * 60)
+
+    with METRICS.phase("connect"):
+        conn = get_connection()
+    conn.autocommit = False
+    METRICS.capture_server_before(conn)
+    conn.commit()
+
+    # Step 1: Migrate schema (outside the seed transaction)
+    print("\n📐  Checking schema migrations...")
+    try:
+        with METRICS.phase("migrate"):
+            applied = migrate(conn)
+    except MigrationError as e:
+        print(f"❌  {e}")
+        conn.close()
+        sys.exit(1)
+    if applied:
+        print(f"    ✅  Applied {len(applied)} migration(s)")
+    else:
+        print(f"    ✅  Schema up to date ({len(MIGRATIONS)} migrations)")
+    cur = conn.cursor()
+
+    if args.scaling_report:
+        conn.commit()
+        cur.close()
+        conn.close()
+        run_scaling_report(source, args.engine, args.chunk_size)
+        get_pool().closeall()
+        return
+
+    if args.export_only:
+        cur.close()
+        write_snapshot(conn, args.export, args.export_shard_size)
+        conn.close()
+        return
+
+    if args.post_load_only:
+        cur.close()
+        lock, _, after_batch = start_online(conn, args) if args.online else (None, None, None)
+        post_load(conn, args, 0, catalog_version(conn), lock, after_batch)
+        if lock is not None:
+            lock.release(conn)
+        METRICS.capture_server_after(conn)
+        conn.close()
+        print("\n✅  Done! Post-load steps finished.")
+        return
+
+    # Step 2 + 3: Parse → build rows → insert, one fixed-size chunk at a time
+    job_id = args.job_id or default_job_id(args.source)
+    skip = 0
+    if args.resume:
+        skip = read_progress(conn, job_id)
+        if skip:
+            print(f"\n⏩  Resuming job {job_id} after {skip:,} source records")
+        else:
+            print(f"\n⏩  No checkpoint for job {job_id}; starting from the beginning")
+    feed = CountingIterator(itertools.islice(source(), skip, None))
+    records = feed
+
+    if args.dedupe:
+        print("\n🧩  Resolving duplicate colleges...")
+        with METRICS.phase("dedupe"):
+            resolver = EntityResolver(args.dedupe_threshold)
+            resolver.add_existing(conn)
+            resolver.add_source(source())
+            resolver.resolve()
+        conn.commit()
+        resolver.print()
+        if args.dedupe_report:
+            with open(args.dedupe_report, "w", encoding="utf-8") as fh:
+                json.dump(resolver.report(), fh, indent=2, ensure_ascii=False)
+            print(f"    📝  Merge report written to {args.dedupe_report}")
+        if args.dedupe == "skip":
+            records = resolver.skip(feed, skip)
+    validator = Validator(records, args.rejects, feed, base=skip, append=args.resume)
+    rows = map(to_db_row, validator)
+
+    changes = None
+    if args.incremental:
+        print("\n🔎  Fetching existing content hashes...")
+        with METRICS.phase("diff"):
+            changes = ChangeFilter(fetch_existing_hashes(conn))
+        print(f"    ✅  {len(changes.existing):,} colleges already in DB")
+        rows = changes(rows)
+
+    plan = None
+    if args.sync:
+        print("\n🔎  Diffing source against colleges...")
+        with METRICS.phase("diff"):
+            plan = SyncPlan.build(conn, map(to_db_row, source()))
+        plan.print()
+        if args.dry_run:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            print("\n🧪  Dry run — nothing written.")
+            return
+        rows = plan.rows(rows)
+
+    def make_engine():
+        return ENGINES[args.engine](force=args.force)
+
+    def apply_deletes(c):
+        if plan is not None and plan.deletes:
+            print(f"    🗑️   Deleting {len(plan.deletes):,} colleges no longer in the source...")
+            with METRICS.phase("delete"):
+                plan.apply_deletes(c, args.chunk_size)
+            METRICS.add("rows_deleted", len(plan.deletes))
+
+    lock = throttle = after_batch = None
+    if args.online:
+        cur.close()
+        lock, throttle, after_batch = start_online(conn, args)
+        cur = conn.cursor()
+
+    start_version = catalog_version(conn)
+    print(f"\n📥  Inserting college records in chunks of {args.chunk_size} "
+          f"(engine: {args.engine}, workers: {args.workers})...")
+    started = time.perf_counter()
+    if args.commit_every:
+        conn.commit()  # schema changes land before the first data batch
+        cur.close()
+        load = CheckpointedLoad(conn, job_id, make_engine, args.chunk_size,
+                                args.commit_every, args.max_retries, after_batch)
+        total = load.run(rows, validator, skip, finish=apply_deletes)
+        conn = load.conn
+        if load.retries:
+            print(f"    🔁  {load.retries} batch(es) retried after transient errors")
+        if throttle is not None:
+            print(f"    🐢  throttled {throttle.slept:.1f}s in total; {throttle.slow_batches} slow batch(es)"
+                  + ("" if throttle.lag_available else "; replica lag not visible to this role"))
+        cur = conn.cursor()
+    elif args.engine == "async":
+        conn.commit()  # the async connection must see the migrated schema
+        with METRICS.phase("send"):
+            total = load_async(rows, args.chunk_size, args.inflight, force=args.force)
+        apply_deletes(cur)
+    elif args.workers > 1:
+        conn.commit()  # shard connections must see the migrated schema
+        results = load_parallel(rows, args.workers, make_engine, args.chunk_size)
+        get_pool().closeall()
+        print_shard_report(results, time.perf_counter() - started)
+        failed = [r for r in results if r.error]
+        if failed:
+            conn.rollback()
+            cur.close()
+            conn.close()
+            print(f"\n❌  {len(failed)} of {args.workers} shards failed and were rolled back; "
+                  "the other shards are committed. Re-run to retry (upserts are idempotent).")
+            sys.exit(1)
+        total = sum(r.rows for r in results)
+        apply_deletes(cur)
+    else:
+        total = load_chunks(conn, chunked(rows, args.chunk_size), make_engine(), progress=True)
+        apply_deletes(cur)
+
+    with METRICS.phase("commit"):
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0.0
+    print(f"    ⏱️   {args.engine}: {total:,} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    validator.print()
+    cur.close()
+
+    post_load(conn, args, total, start_version, lock, after_batch)
+    if lock is not None:
+        lock.release(conn)
+    METRICS.capture_server_after(conn)
+    conn.close()
+
+    print(f"\n✅  Done! {total:,} colleges inserted/updated successfully.")
+    if plan is not None:
+        why = f"rejected — see {args.rejects}"
+        if args.dedupe == "skip":
+            why += "; or merged by --dedupe skip"
+        plan.print_applied(why)
+    if changes is not None:
+        print(f"    ➕  inserted:  {changes.inserted:,}")
+        print(f"    ✏️   updated:   {changes.updated:,}")
+        print(f"    💤  unchanged: {changes.unchanged:,}")
+    print("\n🌐  Visit your site to verify:")
+    print("    https://www.zpluseuniversity.com/colleges\n")
+
+
+def start_online(conn, args):
+    """Take the deploy lock (or exit). Returns (lock, throttle, after_batch) for --online."""
+    lock = DeployLock(pooler_mode())
+    try:
+        lock.acquire(conn)
+    except DeployLockError as e:
+        print(f"\n❌  {e}")
+        conn.close()
+        sys.exit(1)
+    throttle = Throttle(args.target_batch_ms, args.max_replica_lag)
+
+    def after_batch(c, elapsed):
+        lock.renew(c)
+        throttle(c, elapsed)
+
+    print(f"\n🐢  Online mode: batches of {args.commit_every}, lock_timeout {args.lock_timeout}, "
+          f"statement_timeout {args.statement_timeout}, target {args.target_batch_ms}ms/batch")
+    return lock, throttle, after_batch
+
+
+def post_load(conn, args, total, start_version, lock=None, after_batch=None):
+    """
+    Steps 4-5, after the load has committed: derived tables, --similar, facet
+    counts, --maintain and --export. Under --online (`lock` set) the lease is
+    renewed before every step, the batched steps commit and throttle through
+    `after_batch` like the load does, and a step cancelled by the online
+    statement_timeout is skipped (with a note on finishing it later) rather
+    than failing a run whose data is already committed.
+    """
+    skipped = []
+
+    def attempt(step, fn, *fn_args):
+        if lock is not None:
+            lock.renew(conn)
+        try:
+            return fn(*fn_args)
+        except psycopg2.extensions.QueryCanceledError:
+            if lock is None:
+                raise
+            conn.rollback()
+            skipped.append(step)
+            print(f"\n    ⚠️   {step} cancelled by statement_timeout {args.statement_timeout} — skipped")
+            return None
+
+    batch_size = args.commit_every or DERIVED_BATCH
+    derived = 0
+
+    # Step 4: Courses, accreditation/fee encoding and geocodes for every
+    # college changed since they were last derived (not just this run's rows)
+    ids, upto, full = derived_pending(conn, DERIVED_WATERMARK)
+    if ids:
+        scope = "full pass" if full else "changed since the last run"
+        print(f"\n🎓  Deriving courses and encodings for {len(ids):,} colleges ({scope})...")
+        with METRICS.phase("derive"):
+            done = attempt("derived tables", refresh_derived, conn, ids, upto, batch_size, after_batch)
+        if done is not None:
+            derived = done
+            print("    ✅  college_courses / accreditation_tokens / fee_schedules updated")
+    try:
+        gazetteer = Gazetteer(args.gazetteer)
+    except FileNotFoundError:
+        print(f"\n⚠️   Gazetteer {args.gazetteer} not found — skipping geocoding "
+              "(pending colleges are geocoded once it is back)")
+    else:
+        ids, upto, full = derived_pending(conn, GEOCODE_WATERMARK)
+        if ids:
+            scope = "full pass" if full else "changed since the last run"
+            print(f"\n📍  Geocoding {len(ids):,} colleges offline ({scope})...")
+            with METRICS.phase("geocode"):
+                unresolved = attempt("geocoding", refresh_geocodes, conn, ids, upto, gazetteer,
+                                     batch_size, after_batch)
+            if unresolved is not None:
+                print("    ✅  latitude / longitude / geohash updated")
+                for city, state in unresolved[:PLAN_SAMPLE]:
+                    print(f"        ⚠️   no match for {city}, {state}")
+
+    if args.similar:
+        print(f"\n🧭  Computing top-{args.similar} similar colleges...")
+        with METRICS.phase("similar"):
+            scored = attempt("similar colleges", build_similar, conn, args.similar, 10000,
+                             batch_size if lock is not None else None, after_batch)
+            conn.commit()
+        if scored is not None:
+            print(f"    ✅  college_similar updated for {scored:,} colleges")
+
+    # Step 5: Facet counts + catalog version
+    print("\n📊  Refreshing facet counts...")
+    with METRICS.phase("facets"):
+        version = attempt("facet refresh", refresh_facets, conn, total, derived > 0)
+        conn.commit()
+    if version is not None:
+        print(f"    ✅  college_facets refreshed — catalog version {version} "
+              f"({changed_since(conn, start_version):,} college changes since v{start_version})")
+        conn.commit()
+    elif "facet refresh" not in skipped:
+        print(f"    💤  No college changes since the last refresh — catalog version {start_version} kept")
+    if args.maintain:
+        tables = MAINTAIN_TABLES + (("college_similar",) if args.similar else ())
+        print("\n🧹  Post-load maintenance...")
+        between = lock.renew if lock is not None else None
+        steps = attempt("maintenance", maintain, conn, tables, args.vacuum_threshold, PREWARM_RELATIONS, between)
+        for step, relation, seconds, detail in steps or ():
+            print(f"    {step:<8} {relation:<28} {seconds:>7.2f}s  {detail}")
+    if args.export:
+        attempt("export", write_snapshot, conn, args.export, args.export_shard_size)
+
+    if skipped:
+        again = ["--post-load-only"]
+        if "similar colleges" in skipped:
+            again.append(f"--similar {args.similar}")
+        if "maintenance" in skipped:
+            again.append("--maintain")
+        if "export" in skipped:
+            again.append(f"--export {args.export}")
+        print(f"\n⚠️   Skipped under --online: {', '.join(skipped)}. Finish them off-peak with:")
+        print(f"    python seed_colleges.py {' '.join(again)}")
+    return skipped
+
+
+def write_snapshot(conn, out_dir, shard_size):
+    print(f"\n📦  Exporting catalog snapshot to {out_dir}...")
+    with METRICS.phase("export"):
+        version, total, writer = export_snapshot(conn, out_dir, shard_size)
+    METRICS.add("export_bytes", writer.raw_bytes)
+    sizes = f"{writer.raw_bytes / 2**20:.1f}MB raw · {writer.gzip_bytes / 2**20:.1f}MB gzip"
+    if writer.brotli is not None:
+        sizes += f" · {writer.brotli_bytes / 2**20:.1f}MB brotli"
+    print(f"    ✅  v{version}: {total:,} colleges in {writer.files:,} files ({sizes})")
+
+
+def emit_metrics(fmt, path):
+    text = METRICS.to_openmetrics() if fmt == "openmetrics" else METRICS.to_jsonl()
+    if path in (None, "-"):
+        print(f"\n📊  Metrics ({fmt}):")
+        sys.stdout.write(text)
+    else:
+        with open(path, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        print(f"\n📊  Metrics written to {path}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiler = cProfile.Profile() if args.profile else None
+    try:
+        if profiler is not None:
+            profiler.runcall(run, args)
+        else:
+            run(args)
+    finally:
+        if profiler is not None:
+            profiler.dump_stats(args.profile)
+            print(f"\n🧬  cProfile stats written to {args.profile} (top 20 by cumulative time):")
+            pstats.Stats(profiler).sort_stats("cumulative").print_stats(20)
+        if args.metrics:
+            emit_metrics(args.metrics, args.metrics_out)
 
 
 if __name__ == "__main__":
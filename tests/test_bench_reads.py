@@ -0,0 +1,37 @@
+"""bench_reads plan checks: absolute violations and baseline regressions."""
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import bench_reads  # noqa: E402
+
+
+def _report(**flags):
+    return {"queries": {name: {"plan_flags": f, "p95_ms": 1.0} for name, f in flags.items()}}
+
+
+def test_seq_scan_on_limit_queries_is_always_flagged():
+    report = _report(list=["seq_scan:colleges"], dashboard=[], search=["seq_scan:colleges"])
+    assert bench_reads.plan_violations(report) == ["list: plan has seq_scan:colleges"]
+    # The same flags in the baseline don't make it acceptable.
+    assert bench_reads.regressions(report, report, 0.5) == []
+
+
+def test_new_flags_and_slow_p95_against_baseline():
+    baseline = _report(search=[])
+    report = _report(search=["sort_spill"])
+    report["queries"]["search"]["p95_ms"] = 2.0
+    assert bench_reads.regressions(report, baseline, 0.5) == [
+        "search: plan now has sort_spill",
+        "search: p95 2.0ms vs baseline 1.0ms",
+    ]
+
+
+def test_plan_flags_walks_nested_plans():
+    plan = {"Node Type": "Limit", "Plans": [
+        {"Node Type": "Sort", "Sort Space Type": "Disk", "Plans": [
+            {"Node Type": "Seq Scan", "Relation Name": "colleges"},
+        ]},
+    ]}
+    assert bench_reads.plan_flags(plan) == {"sort_spill", "seq_scan:colleges"}
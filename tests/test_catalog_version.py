@@ -0,0 +1,58 @@
+"""refresh_facets: a seed that changed nothing stamps no catalog version."""
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append(sql)
+        if sql == seed.LAST_REFRESH_SQL:
+            self.result = (7,)
+        elif sql == seed.CHANGED_SINCE_SQL:
+            self.result = (self.conn.changed,)
+        elif sql == seed.CATALOG_VERSION_SQL:
+            self.result = (8,)
+
+    def fetchone(self):
+        return self.result
+
+
+class FakeConnection:
+    def __init__(self, changed):
+        self.changed = changed
+        self.executed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def test_no_changes_since_the_last_refresh_is_a_no_op():
+    conn = FakeConnection(changed=0)
+    assert seed.refresh_facets(conn, 0) is None
+    assert seed.CATALOG_VERSION_SQL not in conn.executed
+    assert seed.FACETS_REFRESH_SQL not in conn.executed
+
+
+def test_changes_refresh_and_stamp_a_version():
+    conn = FakeConnection(changed=3)
+    assert seed.refresh_facets(conn, 3) == 8
+    assert seed.FACETS_REFRESH_SQL in conn.executed
+
+
+def test_derived_writes_force_the_refresh():
+    conn = FakeConnection(changed=0)
+    assert seed.refresh_facets(conn, 0, force=True) == 8
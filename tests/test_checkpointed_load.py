@@ -0,0 +1,65 @@
+"""CheckpointedLoad retries: reconnects that fail keep backing off until the limit."""
+
+import pytest
+
+psycopg2 = pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+
+class DroppedConnection:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(seed, "backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(seed.time, "sleep", lambda seconds: None)
+
+
+def test_failed_reconnects_are_retried_until_the_limit(monkeypatch):
+    attempts = []
+
+    def get_connection():
+        attempts.append(1)
+        raise psycopg2.OperationalError("server closed the connection")
+
+    def work(conn):
+        raise psycopg2.OperationalError("connection reset")
+
+    monkeypatch.setattr(seed, "get_connection", get_connection)
+    load = seed.CheckpointedLoad(DroppedConnection(), "job", None, 10, 10, max_retries=3)
+    with pytest.raises(psycopg2.OperationalError):
+        load._transaction(work)
+    assert len(attempts) == 3  # every retry after the first failure reconnects
+    assert load.retries == 3
+    assert load.conn is None
+
+
+def test_recovers_once_the_database_is_back(monkeypatch):
+    outcomes = [psycopg2.OperationalError("down"), psycopg2.OperationalError("still down")]
+
+    class Connection(DroppedConnection):
+        autocommit = True
+
+        def commit(self):
+            pass
+
+    def get_connection():
+        if outcomes:
+            raise outcomes.pop(0)
+        return Connection()
+
+    def work(conn):
+        if isinstance(conn, DroppedConnection) and not isinstance(conn, Connection):
+            raise psycopg2.OperationalError("connection reset")
+
+    monkeypatch.setattr(seed, "get_connection", get_connection)
+    load = seed.CheckpointedLoad(DroppedConnection(), "job", None, 10, 10, max_retries=5)
+    load._transaction(work)
+    assert isinstance(load.conn, Connection)
+    assert load.conn.autocommit is False
+    assert load.retries == 3
@@ -0,0 +1,60 @@
+"""EntityResolver: exact and near-duplicate names cluster; the first one survives."""
+
+from collections import namedtuple
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+Record = namedtuple("Record", "name city state")
+
+
+def resolve(records):
+    resolver = seed.EntityResolver()
+    resolver.add_source(records)
+    resolver.resolve()
+    return resolver
+
+
+def test_abbreviations_and_typos_cluster_into_the_first_name():
+    resolver = resolve([
+        Record("Indian Institute of Technology Bombay", "Mumbai", "Maharashtra"),
+        Record("IIT Bombay", "Mumbai", "Maharashtra"),
+        Record("Indian Institute of Technolgy Bombay", "Mumbai", "Maharashtra"),
+        Record("University of Mumbai", "Mumbai", "Maharashtra"),
+    ])
+    assert len(resolver.clusters) == 1
+    survivor, rest = resolver.clusters[0]
+    assert survivor == 0
+    assert sorted(r for r, _ in rest) == [1, 2]
+    assert all(score >= seed.DEDUPE_THRESHOLD for _, score in rest)
+    assert resolver.drop == {1, 2}
+
+
+def test_exact_duplicates_keep_the_last_occurrence():
+    resolver = resolve([
+        Record("Christ University", "Bengaluru", "Karnataka"),
+        Record("Christ University", "Bengaluru", "Karnataka"),
+    ])
+    assert resolver.exact == 1
+    assert resolver.drop == {0}
+    assert list(resolver.skip(["first", "second"])) == ["second"]
+
+
+def test_numbered_campuses_and_other_cities_stay_apart():
+    resolver = resolve([
+        Record("Kendriya Vidyalaya Campus 2", "Delhi", "Delhi"),
+        Record("Kendriya Vidyalaya Campus 3", "Delhi", "Delhi"),
+        Record("Government Engineering College", "Thrissur", "Kerala"),
+        Record("Government Engineering College", "Barton Hill", "Kerala"),
+    ])
+    assert resolver.clusters == []
+    assert resolver.drop == {2}  # only the exact repeat of the name
+
+
+def test_name_similarity_bounds():
+    tokens = seed.name_tokens("National Institute of Technology Trichy")
+    assert seed.name_similarity(tokens, seed.name_tokens("NIT Trichy")) == 1.0
+    assert seed.name_similarity(tokens, []) == 0.0
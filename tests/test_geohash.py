@@ -0,0 +1,74 @@
+"""Geohash encoding, bounding-box covers and the colleges_near search box."""
+
+import math
+import random
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+
+def test_encode_matches_the_reference_geohash():
+    assert seed.geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert seed.geohash_encode(42.605, -5.603, 5) == "ezs42"
+
+
+def test_cell_size_halves_alternately():
+    assert seed.geohash_cell_size(1) == (45.0, 45.0)
+    assert seed.geohash_cell_size(2) == (45.0 / 8, 45.0 / 4)
+
+
+@pytest.mark.parametrize("box", [
+    (12.90, 77.50, 13.10, 77.70),    # Bengaluru
+    (28.40, 76.80, 28.90, 77.40),    # Delhi NCR
+    (8.0, 68.0, 37.0, 97.0),         # all of India
+])
+def test_cover_contains_every_point_in_the_box(box):
+    cells = seed.geohash_cover(*box)
+    assert 0 < len(cells) <= seed.GEOHASH_MAX_CELLS
+    rng = random.Random(str(box))
+    for _ in range(500):
+        lat = rng.uniform(box[0], box[2])
+        lon = rng.uniform(box[1], box[3])
+        code = seed.geohash_encode(lat, lon)
+        assert any(code.startswith(cell) for cell in cells), (lat, lon)
+
+
+class Cursor:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.calls.append((sql, params))
+
+    def fetchall(self):
+        return []
+
+
+class Connection:
+    def __init__(self):
+        self.calls = []
+
+    def cursor(self):
+        return Cursor(self.calls)
+
+
+def test_near_box_spans_the_radius_in_both_directions():
+    conn = Connection()
+    seed.colleges_near(conn, 19.0760, 72.8777, radius_km=10.0, limit=5)
+    (sql, params), = conn.calls
+    dlat = 10.0 / seed.KM_PER_DEGREE
+    dlon = dlat / math.cos(math.radians(19.0760))
+    assert params["min_lat"] == pytest.approx(19.0760 - dlat)
+    assert params["max_lon"] == pytest.approx(72.8777 + dlon)
+    cells = [v for k, v in params.items() if k.startswith("cell")]
+    assert sql.count("geohash LIKE") == len(cells)
+    assert any(seed.geohash_encode(19.0760, 72.8777).startswith(c.rstrip("%")) for c in cells)
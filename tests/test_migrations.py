@@ -0,0 +1,75 @@
+"""migrate(): applied versions are skipped by checksum, edited ones refused."""
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+M1 = seed.Migration(1, "one", "CREATE TABLE a (id INT);")
+M2 = seed.Migration(2, "two", "CREATE TABLE b (id INT);")
+M3 = seed.Migration(3, "three", "CREATE TABLE c (id INT);")
+
+
+class Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.result = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if sql == seed.MIGRATION_APPLIED_SQL:
+            self.result = list(self.conn.applied.items())
+        elif sql == seed.MIGRATION_RECORD_SQL:
+            self.conn.applied[params[0]] = params[2]
+        elif sql not in (seed.MIGRATION_LEDGER_SQL, seed.MIGRATION_LOCK_SQL):
+            self.conn.ran.append(sql)
+
+    def fetchall(self):
+        return self.result
+
+
+class Connection:
+    def __init__(self, applied=None):
+        self.applied = dict(applied or {})
+        self.ran = []
+
+    def cursor(self):
+        return Cursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+def test_checksum_ignores_whitespace_only():
+    assert seed.migration_checksum(M1) == seed.migration_checksum(
+        seed.Migration(1, "one", "\n  CREATE TABLE a\n  (id INT);\n"))
+    assert seed.migration_checksum(M1) != seed.migration_checksum(M2)
+
+
+def test_pending_migrations_run_in_version_order():
+    conn = Connection({1: seed.migration_checksum(M1)})
+    assert seed.migrate(conn, (M3, M1, M2)) == [2, 3]
+    assert conn.ran == [M2.sql, M3.sql]
+    assert seed.migrate(conn, (M1, M2, M3)) == []
+
+
+def test_changed_applied_migration_is_refused():
+    conn = Connection({1: seed.migration_checksum(M1)})
+    edited = M1._replace(sql="CREATE TABLE a (id BIGINT);")
+    with pytest.raises(seed.MigrationError, match="0001 one"):
+        seed.migrate(conn, (edited, M2))
+    assert conn.ran == []
+
+
+def test_shipped_migrations_are_numbered_without_gaps():
+    versions = [m.version for m in seed.MIGRATIONS]
+    assert versions == list(range(1, len(versions) + 1))
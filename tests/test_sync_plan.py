@@ -0,0 +1,73 @@
+"""SyncPlan: classify source rows against colleges and report what was sent."""
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import seed_colleges as seed  # noqa: E402
+
+
+class NamedCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        assert sql == seed.EXISTING_HASHES_SQL
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class Connection:
+    def __init__(self, existing):
+        self.existing = existing
+
+    def cursor(self, name=None):
+        assert name is not None  # the diff streams colleges server-side
+        return NamedCursor(self.existing)
+
+
+SOURCE = [
+    ("Alpha College", "a1"),
+    ("Beta College", "b2"),
+    ("Gamma College", "g1"),
+    ("", "blank"),
+    ("x" * 256, "too long"),
+]
+EXISTING = [("Beta College", "b1"), ("Gamma College", "g1"), ("Delta College", "d1")]
+
+
+def test_build_classifies_every_name():
+    plan = seed.SyncPlan.build(Connection(EXISTING), SOURCE)
+    assert plan.inserts == {"Alpha College"}
+    assert plan.updates == {"Beta College"}
+    assert plan.deletes == ["Delta College"]
+    assert plan.unchanged == 1
+    assert plan.invalid == 2  # blank and over-long names are counted, not planned
+
+
+def test_rows_sends_the_last_planned_occurrence_once():
+    plan = seed.SyncPlan.build(Connection(EXISTING), SOURCE)
+    source = [("Alpha College", "a0"), ("Alpha College", "a1"), ("Alpha College", "a1"),
+              ("Beta College", "b2"), ("Gamma College", "g1")]
+    assert list(plan.rows(source)) == [("Alpha College", "a1"), ("Beta College", "b2")]
+    assert (plan.inserted, plan.updated, plan.not_sent) == (1, 1, set())
+
+
+def test_rows_rejected_after_planning_are_not_counted_as_applied():
+    plan = seed.SyncPlan.build(Connection(EXISTING), SOURCE)
+    assert list(plan.rows([("Beta College", "b2")])) == [("Beta College", "b2")]
+    assert (plan.inserted, plan.updated) == (0, 1)
+    assert plan.not_sent == {"Alpha College"}
+
+
+def test_nothing_to_do_is_empty():
+    plan = seed.SyncPlan.build(Connection([("Gamma College", "g1")]), [("Gamma College", "g1")])
+    assert plan.is_empty
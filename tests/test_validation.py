@@ -0,0 +1,56 @@
+"""Parity between the vectorized (numpy) and per-value validation paths."""
+
+import random
+
+import pytest
+
+pytest.importorskip("psycopg2")
+np = pytest.importorskip("numpy")
+
+import seed_colleges as seed  # noqa: E402
+
+POOLS = {
+    "required": [None, "", " ", "a", "IIT Madras"],
+    "text": [None, "", "a", "x" * 50, "x" * 51, "x" * 101, "x" * 201, "x" * 256, "x" * 301, 5],
+    "enum": [None, "Public", "Deemed", "Gov", "", 3],
+    "range": [None, 0, 1, 5, 5.01, -1, 1990, 1990.5, 2024, 10_001, float("nan"), True,
+              "abc", "12.0", "1990.5", "3"],
+    "url": [None, "http://", "https://", "http://a", "https://a b", "ftp://x", "httpS://a",
+            "https://" + "a" * 300, 7],
+    "courses": [[], ["B.Tech"], [" "], ["x"] * 201, ["x" * 121], ["x" * 120], None, "s", [1]],
+}
+
+
+def _fuzz(check, n, rng):
+    return [rng.choice(POOLS[check]) for _ in range(n)]
+
+
+@pytest.mark.parametrize("field,check,arg", seed.VALIDATION_RULES)
+def test_numpy_flags_match_value_problem(field, check, arg):
+    rng = random.Random(f"{field}:{check}")
+    for _ in range(20):
+        values = _fuzz(check, 800, rng)
+        expected = [seed.value_problem(check, arg, v) is not None for v in values]
+        assert list(seed._numpy_flags(check, arg, values)) == expected
+
+
+@pytest.mark.parametrize("check", ["range", "courses", "text"])
+def test_clean_columns_take_the_array_path(check):
+    # All-valid columns exercise the vectorized branch rather than the fallback.
+    field, _, arg = next(r for r in seed.VALIDATION_RULES if r[1] == check)
+    values = [r[seed.FIELD_INDEX[field]] for r in seed.iter_synthetic(1000)]
+    expected = [seed.value_problem(check, arg, v) is not None for v in values]
+    assert list(seed._numpy_flags(check, arg, values)) == expected
+
+
+def test_validate_batch_same_with_and_without_numpy(monkeypatch):
+    rng = random.Random(7)
+    records = list(seed.iter_synthetic(2000, seed=3))
+    for i in rng.sample(range(len(records)), 200):
+        field, check, _ = rng.choice(seed.VALIDATION_RULES)
+        records[i] = records[i]._replace(**{field: rng.choice(POOLS[check])})
+    records += records[:5]  # in-batch duplicates
+    vectorized = seed.validate_batch(records)
+    monkeypatch.setattr(seed, "np", None)
+    assert seed.validate_batch(records) == vectorized
+    assert vectorized